@@ -0,0 +1,330 @@
+# benchmarks.py
+# -------------
+
+"""
+Micro-benchmarks for the code that runs on every simulated move.
+
+  python benchmarks.py successors -l laberynths/labAA3 -n 20000
+
+Each benchmark prints the time per operation and, where it matters for
+memory, how many Python objects every operation leaves alive.
+"""
+
+import gc, random, sys, time
+import busters, game, layout, util
+
+def countObjects():
+    "Number of objects tracked by the garbage collector"
+    gc.collect()
+    return len(gc.get_objects())
+
+def benchmarkSuccessors( board, options ):
+    """
+    Plays random legal moves from the initial state of board, keeping every
+    successor alive (as search and observation histories do), and reports
+    the microseconds and the live objects added per generated successor.
+    """
+    numMoves = options.numMoves
+    random.seed(options.seed)
+    initial = busters.GameState()
+    initial.initialize( board, min(options.numGhosts, board.getNumGhosts()) )
+    actions = []
+    state = initial
+    for move in range( numMoves ):
+        if state.isWin() or state.isLose():
+            state = initial
+        agentIndex = move % state.getNumAgents()
+        action = random.choice( state.getLegalActions( agentIndex ) )
+        actions.append((agentIndex, action))
+        state = state.generateSuccessor( agentIndex, action )
+
+    # Replay the same moves, timed, with the successors kept alive
+    random.seed(options.seed)
+    kept = []
+    before = countObjects()
+    state = initial
+    startTime = time.time()
+    for agentIndex, action in actions:
+        if state.isWin() or state.isLose():
+            state = initial
+        state = state.generateSuccessor( agentIndex, action )
+        kept.append(state)
+    elapsed = time.time() - startTime
+    objects = countObjects() - before
+
+    print 'Successors:    %d moves on a %dx%d layout' % (numMoves, board.width, board.height)
+    print 'us per move:   %.2f' % (elapsed * 1e6 / numMoves)
+    print 'objects/move:  %.2f' % (objects / float(numMoves))
+
+def benchmarkObservations( board, options ):
+    """
+    Times GameState.deepCopy, which Game.run calls for every observation
+    handed to an agent, on the initial state of board.
+    """
+    state = busters.GameState()
+    state.initialize( board, min(options.numGhosts, board.getNumGhosts()) )
+    startTime = time.time()
+    for move in range( options.numMoves ):
+        state.deepCopy()
+    elapsed = time.time() - startTime
+
+    print 'Observations:  %d copies on a %dx%d layout' % (options.numMoves, board.width, board.height)
+    print 'us per copy:   %.2f' % (elapsed * 1e6 / options.numMoves)
+
+def benchmarkFood( board, options ):
+    """
+    Times the food grid operations of a move (copy, count, hash and
+    packBits) on the layout's BitGrid and on an equivalent list Grid.
+    """
+    grid = game.Grid( board.width, board.height )
+    for x, y in board.food.asList():
+        grid[x][y] = True
+    print 'Food:          %d moves on a %dx%d layout' % (options.numMoves, board.width, board.height)
+    for name, food in [('BitGrid', board.food), ('Grid', grid)]:
+        startTime = time.time()
+        for move in range( options.numMoves ):
+            food.copy(); food.count(); hash(food); food.packBits()
+        elapsed = time.time() - startTime
+        print '%-15s%.2f us per move' % (name + ':', elapsed * 1e6 / options.numMoves)
+
+def benchmarkSampling( board, options ):
+    """
+    Times a ghost's move choice: sampling a uniform distribution over four
+    actions with util.sample, and with a prepared util.Sampler.
+    """
+    dist = util.Counter()
+    for action in [game.Directions.NORTH, game.Directions.SOUTH, game.Directions.EAST, game.Directions.WEST]:
+        dist[action] = 1.0
+    dist.normalize()
+    sampler = util.Sampler(dist)
+    print 'Sampling:      %d draws' % options.numMoves
+    for name, draw in [('sample', lambda: util.sample(dist)), ('Sampler', sampler.sample)]:
+        startTime = time.time()
+        for move in range( options.numMoves ):
+            draw()
+        elapsed = time.time() - startTime
+        print '%-15s%.2f us per draw' % (name + ':', elapsed * 1e6 / options.numMoves)
+
+def benchmarkCounters( board, options ):
+    """
+    Times the common operations on a belief-sized distribution (one key per
+    open cell of board) with util.Counter and util.LeanCounter.
+    """
+    cells = board.walls.asList(False)
+    operations = [('read', lambda c: [c[(-1, i)] for i in range(10)]),
+                  ('increment', lambda c: c.incrementAll(cells[:10], 1)),
+                  ('totalCount', lambda c: c.totalCount()),
+                  ('normalize', lambda c: c.normalize()),
+                  ('argMax', lambda c: c.argMax()),
+                  ('sortedKeys', lambda c: c.sortedKeys()),
+                  ('copy', lambda c: c.copy())]
+    numRuns = max(1, options.numMoves / 10)
+    print 'Counters:      %d keys, %d runs' % (len(cells), numRuns)
+    for name, operation in operations:
+        times = []
+        for counterType in [util.Counter, util.LeanCounter]:
+            counter = counterType()
+            for i, cell in enumerate(cells): counter[cell] = i + 1
+            startTime = time.time()
+            for run in range( numRuns ):
+                operation(counter)
+            times.append((time.time() - startTime) * 1e6 / numRuns)
+        print '%-15s%8.2f us Counter %8.2f us LeanCounter' % (name + ':', times[0], times[1])
+
+def benchmarkNearestFood( board, options ):
+    """
+    Times the nearest food queries of GameState on the initial state of
+    board (Manhattan and maze distance) against a walk of the food grid.
+    """
+    from distanceCalculator import Distancer
+    state = busters.GameState()
+    state.initialize( board, min(options.numGhosts, board.getNumGhosts()) )
+    distancer = Distancer( board, False )
+    def gridWalk():
+        pacmanPosition = state.getPacmanPosition()
+        distances = [util.manhattanDistance(pacmanPosition, (x, y))
+                     for x in range(board.width) for y in range(board.height) if state.hasFood(x, y)]
+        return min(distances or [None])
+    queries = [('grid walk', gridWalk),
+               ('manhattan', state.getDistanceNearestFood),
+               ('maze', lambda: state.getMazeDistanceNearestFood(distancer))]
+    if state.getNumFood() == 0:
+        raise Exception('The layout has no food to search for; use one with food, such as ' + LAYOUTS['nearestfood'])
+    print 'Nearest food:  %d food on a %dx%d layout' % (state.getNumFood(), board.width, board.height)
+    for name, query in queries:
+        startTime = time.time()
+        for move in range( options.numMoves ):
+            query()
+        elapsed = time.time() - startTime
+        print '%-15s%.2f us per query' % (name + ':', elapsed * 1e6 / options.numMoves)
+
+def benchmarkVector( board, options ):
+    """
+    Compares rounds per second (a random Pacman move and a random move of
+    every ghost) of GameState.generateSuccessor and of a VectorBustersEnv
+    playing 1000 games at once, restarting games as they end.
+    """
+    import vectorBusters
+    random.seed(options.seed)
+    initial = busters.GameState()
+    initial.initialize( board, min(options.numGhosts, board.getNumGhosts()) )
+    state = initial
+    startTime = time.time()
+    for move in range( options.numMoves ):
+        for agentIndex in range( state.getNumAgents() ):
+            if state.isWin() or state.isLose():
+                state = initial
+                break
+            state = state.generateSuccessor( agentIndex, random.choice( state.getLegalActions( agentIndex ) ) )
+    scalarRate = options.numMoves / (time.time() - startTime)
+
+    env = vectorBusters.VectorBustersEnv( board, 1000, options.numGhosts, seed=options.seed )
+    env.reset()
+    numSteps = max(1, options.numMoves / 100)
+    startTime = time.time()
+    for step in range( numSteps ):
+        env.step( env.randomActions() )
+        env.reset( env.done )
+    vectorRate = numSteps * env.numGames / (time.time() - startTime)
+
+    print 'Vector:        %dx%d layout, %d ghosts' % (board.width, board.height, env.numGhosts)
+    print 'GameState:     %.0f rounds/sec' % scalarRate
+    print 'VectorBusters: %.0f rounds/sec (%.0fx)' % (vectorRate, vectorRate / scalarRate)
+
+def benchmarkModels( board, options ):
+    """
+    Compares the startup time and the time per prediction of a model
+    exported by wekaNative.py and, if given, of the same model served by
+    Weka, on the instances of an ARFF file.
+    """
+    if not options.model or not options.arff:
+        print 'Models:        skipped (needs --model and --arff)'
+        return
+    import wekaNative
+    f = open( options.arff )
+    try:
+        lines = [line.strip() for line in f]
+    finally: f.close()
+    start = [line.lower() for line in lines].index('@data') + 1
+    instances = [line.split(',')[:-1] for line in lines[start:] if line and not line.startswith('%')]
+    instances = instances[:options.numMoves]
+    print 'Models:        %d instances of %s' % (len(instances), options.arff)
+
+    loaders = [('native', lambda: wekaNative.loadModel( options.model ))]
+    if options.wekaModel:
+        def loadWeka():
+            from wekaI import Weka
+            weka = Weka()
+            weka.start_jvm()
+            return weka.session( options.wekaModel, options.arff )
+        loaders.append(('weka', loadWeka))
+    for name, load in loaders:
+        startTime = time.time()
+        model = load()
+        startup = time.time() - startTime
+        startTime = time.time()
+        for x in instances:
+            model.predict( list(x) )
+        elapsed = time.time() - startTime
+        print '%-15s%.3f s startup, %.2f us per prediction' % (name + ':', startup, elapsed * 1e6 / len(instances))
+
+def benchmarkDatasets( board, options ):
+    """
+    Times logging one row of features per move, as game2 does: a write to
+    the file per row, a DatasetWriter (in the game loop and with a
+    background thread) and an NpzWriter storing the typed values.  The
+    text writers format the values of every row as strings, which the
+    NpzWriter does not need.
+    """
+    import datasets, features, os, shutil, tempfile
+    state = busters.GameState()
+    state.initialize( board, min(options.numGhosts, board.getNumGhosts()) )
+    extractor = features.getExtractor( state.getNumAgents() - 1 )
+    extractor.extract( state, game.Directions.STOP )
+    numAttributes = len(extractor.values)
+    directory = tempfile.mkdtemp()
+    def writeEach(path):
+        f = open(path, 'a')
+        for move in range( options.numMoves ):
+            f.write(','.join(extractor.format()))
+            f.write('\n')
+        f.close()
+    def writeBuffered(path, background=False):
+        writer = datasets.DatasetWriter(path, background=background)
+        for move in range( options.numMoves ):
+            writer.write(extractor.format())
+        writer.close()
+    def writeNpz(path):
+        writer = datasets.NpzWriter(path, extractor.names)
+        for move in range( options.numMoves ):
+            writer.write(extractor.values)
+        writer.close()
+    writers = [('file.write', writeEach), ('DatasetWriter', writeBuffered),
+               ('background', lambda path: writeBuffered(path, True)), ('NpzWriter', writeNpz)]
+    print 'Datasets:      %d rows of %d attributes' % (options.numMoves, numAttributes)
+    try:
+        for name, write in writers:
+            startTime = time.time()
+            write( os.path.join(directory, name) )
+            elapsed = time.time() - startTime
+            print '%-15s%.2f us per row' % (name + ':', elapsed * 1e6 / options.numMoves)
+    finally: shutil.rmtree(directory)
+
+BENCHMARKS = { 'successors': benchmarkSuccessors,
+               'vector': benchmarkVector,
+               'counters': benchmarkCounters,
+               'sampling': benchmarkSampling,
+               'observations': benchmarkObservations,
+               'food': benchmarkFood,
+               'nearestfood': benchmarkNearestFood,
+               'models': benchmarkModels,
+               'datasets': benchmarkDatasets }
+
+# Layouts of the benchmarks that need something DEFAULT_LAYOUT lacks
+DEFAULT_LAYOUT = 'laberynths/labAA3'
+LAYOUTS = { 'nearestfood': 'laberynths/labAA5' }
+
+def readCommand( argv ):
+    """
+    Processes the command used to run the benchmarks from the command line.
+    """
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python benchmarks.py <options> [benchmark ...]
+    EXAMPLE:    python benchmarks.py successors -l laberynths/labAA3
+    BENCHMARKS: """ + ', '.join(sorted(BENCHMARKS.keys()))
+    parser = OptionParser(usageStr)
+
+    parser.add_option('-l', '--layout', dest='layout',
+                      help='the LAYOUT_FILE to benchmark on (default: %s, or %s for nearestfood)' %
+                      (DEFAULT_LAYOUT, LAYOUTS['nearestfood']), metavar='LAYOUT_FILE', default=None)
+    parser.add_option('-k', '--numghosts', type='int', dest='numGhosts',
+                      help=busters.default('The maximum number of ghosts to use'), default=4)
+    parser.add_option('-n', '--numMoves', type='int', dest='numMoves',
+                      help=busters.default('the number of MOVES to simulate'), metavar='MOVES', default=20000)
+    parser.add_option('-s', '--seed', dest='seed', type='int',
+                      help=busters.default('Random seed'), default=0)
+    parser.add_option('-m', '--model', dest='model',
+                      help='a model exported by wekaNative.py, for the models benchmark', default=None)
+    parser.add_option('-w', '--wekaModel', dest='wekaModel',
+                      help='the same model as saved by Weka, for the models benchmark', default=None)
+    parser.add_option('-a', '--arff', dest='arff',
+                      help='the ARFF file holding the instances to predict, for the models benchmark', default=None)
+
+    options, names = parser.parse_args(argv)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise Exception('Unknown benchmark: ' + name)
+    return names or sorted(BENCHMARKS.keys()), options
+
+def getBoard( name, options ):
+    "The layout to run benchmark name on: the one given with -l, or its default"
+    layoutName = options.layout or LAYOUTS.get(name, DEFAULT_LAYOUT)
+    board = layout.getLayout( layoutName )
+    if board == None: raise Exception("The layout " + layoutName + " cannot be found")
+    return board
+
+if __name__ == '__main__':
+    names, options = readCommand( sys.argv[1:] )
+    for name in names:
+        BENCHMARKS[name]( getBoard(name, options), options )
@@ -22,6 +22,7 @@ The keys are 'a', 's', 'd', and 'w' to move (or arrow keys).  Have fun!
 """
 from game import GameStateData
 from game import Game
+from game import FastGame
 from game import Directions
 from game import Actions
 from game import Configuration
@@ -53,9 +54,9 @@ def getObservationDistribution(noisyDistance):
     """
     global observationDistributions
     if noisyDistance == None:
-        return util.Counter()
+        return util.LeanCounter()
     if noisyDistance not in observationDistributions:
-        distribution = util.Counter()
+        distribution = util.LeanCounter()
         for error , prob in zip(SONAR_NOISE_VALUES, SONAR_NOISE_PROBS):
             distribution[max(1, noisyDistance - error)] += prob
         observationDistributions[noisyDistance] = distribution
@@ -103,7 +104,8 @@ class GameState:
         # Check that successors exist
         if self.isWin() or self.isLose(): raise Exception('Can\'t generate a successor of a terminal state.')
 
-        # Copy current state
+        # Copy current state; food, capsules and agent states stay shared
+        # until the rules below change them
         state = GameState(self)
 
         # Let agent's logic deal with its action's effects on the board
@@ -221,21 +223,29 @@ class GameState:
         """
         Returns the distance to the nearest food
         """
-        if(self.getNumFood() > 0):
-            minDistance = 900000
-            pacmanPosition = self.getPacmanPosition()
-            for i in range(self.data.layout.width):
-                for j in range(self.data.layout.height):
-                    if self.hasFood(i, j):
-                        foodPosition = i, j
-                        distance = util.manhattanDistance(pacmanPosition, foodPosition)
-                        if distance < minDistance:
-                            minDistance = distance
-            return minDistance
-
+        if self.foodPositions:
+            x, y = self.getPacmanPosition()
+            return min([abs(x - fx) + abs(y - fy) for fx, fy in self.foodPositions])
         else:
             return None;
 
+    def getMazeDistanceNearestFood(self, distancer):
+        """
+        Returns the maze distance to the nearest food, as measured by a
+        distanceCalculator.Distancer for this layout
+        """
+        if self.foodPositions:
+            pacmanPosition = self.getPacmanPosition()
+            return min([distancer.getDistance(pacmanPosition, food) for food in self.foodPositions])
+        else:
+            return None
+
+    def getFoodPositions(self):
+        """
+        Returns a frozenset of the positions (x,y) of the remaining food.
+        """
+        return self.foodPositions
+
     def getGhostPositions(self):
         return self.ghostPositions
 
@@ -243,6 +253,8 @@ class GameState:
         return self.ghostDirections
 
     def setGhostNotLiving(self, index):
+        # The list may be shared with the predecessor state
+        self.livingGhosts = self.livingGhosts[:]
         self.livingGhosts[index] = False
 
     def isLose( self ):
@@ -267,13 +279,15 @@ class GameState:
         Generates a new state by copying information from its predecessor.
         """
         if prevState != None:
-            self.data = GameStateData(prevState.data)
-            self.livingGhosts = prevState.livingGhosts[:]
-            self.ghostPositions = prevState.ghostPositions[:]
+            self.data = prevState.data.copyOnWrite()
+            self.livingGhosts = prevState.livingGhosts
+            self.ghostPositions = prevState.ghostPositions
+            self.foodPositions = prevState.foodPositions
             self.numMoves = prevState.numMoves;
             self.maxMoves = prevState.maxMoves;
         else: # Initial state
             self.data = GameStateData()
+            self.foodPositions = frozenset()
             self.numMoves = 0;
             self.maxMoves = -1;
             self.data.ghostDistances = []
@@ -306,6 +320,9 @@ class GameState:
         """
         self.data.initialize(layout, numGhostAgents)
         self.livingGhosts = [False] + [True for i in range(numGhostAgents)]
+        # Kept in step with data.food by checkFoodEaten, so that nearest
+        # food queries never walk the grid
+        self.foodPositions = frozenset(self.data.food.asList())
         self.data.ghostDistances = [getNoisyDistance(self.getPacmanPosition(), self.getGhostPosition(i)) for i in range(1, self.getNumAgents())]
         self.ghostPositions = [self.getGhostPosition(i) for i in range(1, self.getNumAgents())]
 
@@ -331,6 +348,8 @@ class GameState:
 
 COLLISION_TOLERANCE = 0.7 # How close ghosts must be to Pacman to kill
 TIME_PENALTY = 1 # Number of points lost each round
+FOOD_SCORE = 100 # Points for eating a food dot
+GHOST_SCORE = 200 # Points for catching a ghost
 
 class BustersGameRules:
     """
@@ -338,11 +357,17 @@ class BustersGameRules:
     and how the game starts and ends.
     """
 
-    def newGame( self, layout, pacmanAgent, ghostAgents, display, maxMoves= -1 ):
+    def newGame( self, layout, pacmanAgent, ghostAgents, display, maxMoves= -1, fast=False ):
+        """
+        Sets up a game; with fast, a FastGame that never calls the display.
+        """
         agents = [pacmanAgent] + ghostAgents
         initState = GameState()
         initState.initialize( layout, len(ghostAgents))
-        game = Game(agents, display, self)
+        if fast:
+            game = FastGame(agents, self)
+        else:
+            game = Game(agents, display, self)
         game.state = initState
         game.state.maxMoves = maxMoves
         return game
@@ -369,18 +394,19 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions( state.getPacmanState().configuration, state.data.layout.walls )
+        layout = state.data.layout
+        return Actions.getPossibleActions( state.data.agentStates[0].configuration, layout.walls, layout.getLegalActions() )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action ):
         """
         Edits the state to reflect the results of the action.
         """
-        legal = PacmanRules.getLegalActions( state )
-        if action not in legal:
+        layout = state.data.layout
+        if not Actions.isPossibleAction( state.data.agentStates[0].configuration, layout.walls, action, layout.getLegalActionSets() ):
             raise "Illegal action", action
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.copyAgentState(0)
 
         # Update Configuration
         vector = Actions.directionToVector( action, 1)
@@ -394,15 +420,17 @@ class GhostRules:
     """
     def getLegalActions( state, ghostIndex ):
         conf = state.getGhostState( ghostIndex ).configuration
-        return Actions.getPossibleActions( conf, state.data.layout.walls )
+        layout = state.data.layout
+        return Actions.getPossibleActions( conf, layout.walls, layout.getLegalActions() )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action, ghostIndex):
-        legal = GhostRules.getLegalActions( state, ghostIndex )
-        if action not in legal:
+        conf = state.getGhostState( ghostIndex ).configuration
+        layout = state.data.layout
+        if not Actions.isPossibleAction( conf, layout.walls, action, layout.getLegalActionSets() ):
             raise Exception("Illegal ghost action: " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.copyAgentState(ghostIndex)
         vector = Actions.directionToVector( action, 1 )
         ghostState.configuration = ghostState.configuration.generateSuccessor( vector )
     applyAction = staticmethod( applyAction )
@@ -434,13 +462,16 @@ class GhostRules:
         if agentIndex == 0: # Pacman just moved; Anyone can kill him
             if state.hasFood(pacmanPosition[0], pacmanPosition[1]):
                 state.data._foodEaten = pacmanPosition[0], pacmanPosition[1]
+                state.data.food = state.data.food.copy()
                 state.data.food[pacmanPosition[0]][pacmanPosition[1]] = False
-                state.data.scoreChange += 100
+                state.foodPositions = state.foodPositions - frozenset([pacmanPosition])
+                state.data.scoreChange += FOOD_SCORE
     checkFoodEaten = staticmethod( checkFoodEaten )
 
 
     def collide( state, ghostState, agentIndex):
-        state.data.scoreChange += 200
+        state.data.scoreChange += GHOST_SCORE
+        ghostState = state.data.copyAgentState(agentIndex)
         GhostRules.placeGhost(ghostState, agentIndex)
         # Added for first-person
         state.data._eaten[agentIndex] = True
@@ -451,8 +482,13 @@ class GhostRules:
         return manhattanDistance( ghostPosition, pacmanPosition ) <= COLLISION_TOLERANCE
     canKill = staticmethod( canKill )
 
+    def getJailPosition(agentIndex):
+        "The prison cell a captured ghost is sent to"
+        return (agentIndex * 2 - 1, 1)
+    getJailPosition = staticmethod( getJailPosition )
+
     def placeGhost(ghostState, agentIndex):
-        pos = (agentIndex * 2 - 1, 1)
+        pos = GhostRules.getJailPosition(agentIndex)
         direction = Directions.STOP
         ghostState.configuration = Configuration(pos, direction)
     placeGhost = staticmethod( placeGhost )
@@ -514,7 +550,7 @@ def readCommand( argv ):
                       help=default('the ghost agent TYPE in the ghostAgents module to use'),
                       metavar = 'TYPE', default='StaticGhost')
     parser.add_option('-q', '--quietTextGraphics', action='store_true', dest='quietGraphics',
-                      help='Generate minimal output and no graphics', default=False)
+                      help='Generate minimal output and no graphics (headless, no Tk window)', default=False)
     parser.add_option('-k', '--numghosts', type='int', dest='numGhosts',
                       help=default('The maximum number of ghosts to use'), default=4)
     parser.add_option('-z', '--zoom', type='float', dest='zoom',
@@ -549,11 +585,20 @@ def readCommand( argv ):
     agentOpts['ghostAgents'] = args['ghosts']
     pacman = pacmanType(**agentOpts) # Instantiate Pacman with agentArgs
     args['pacman'] = pacman
-    import graphicsDisplay
-    args['display'] = graphicsDisplay.FirstPersonPacmanGraphics(options.zoom, \
-                                                                  options.showGhosts, \
-                                                                  frameTime = options.frameTime)
+
+    # Choose a display format
+    if options.quietGraphics:
+        # Headless: never touch graphicsUtils, so no Tk window is needed
+        import textDisplay
+        args['display'] = textDisplay.NullGraphics()
+    else:
+        import graphicsDisplay
+        args['display'] = graphicsDisplay.FirstPersonPacmanGraphics(options.zoom, \
+                                                                      options.showGhosts, \
+                                                                      frameTime = options.frameTime)
     args['numGames'] = options.numGames
+    # Nothing is shown with -q, so games can skip Game.run's bookkeeping
+    args['fast'] = options.quietGraphics
 
     return args
 
@@ -580,7 +625,7 @@ def loadAgent(pacman, nographics):
                 return getattr(module, pacman)
     raise Exception('The agent ' + pacman + ' is not specified in any *Agents.py.')
 
-def runGames( layout, pacman, ghosts, display, numGames, maxMoves=-1):
+def runGames( layout, pacman, ghosts, display, numGames, maxMoves=-1, fast=False):
     # Hack for agents writing to the display
     import __main__
     __main__.__dict__['_display'] = display
@@ -588,10 +633,12 @@ def runGames( layout, pacman, ghosts, display, numGames, maxMoves=-1):
     rules = BustersGameRules()
     games = []
 
+    startTime = time.time()
     for i in range( numGames ):
-        game = rules.newGame( layout, pacman, ghosts, display, maxMoves )
+        game = rules.newGame( layout, pacman, ghosts, display, maxMoves, fast )
         game.run()
         games.append(game)
+    elapsed = time.time() - startTime
 
     if numGames >= 1:
         scores = [game.state.getScore() for game in games]
@@ -601,6 +648,7 @@ def runGames( layout, pacman, ghosts, display, numGames, maxMoves=-1):
         print 'Scores:       ', ', '.join([str(score) for score in scores])
         print 'Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)
         print 'Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])
+        print 'Episodes/sec:  %.2f (%d in %.2fs)' % (numGames / max(elapsed, 1e-9), numGames, elapsed)
 
     return games
 
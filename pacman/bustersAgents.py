@@ -20,6 +20,9 @@ import busters
 import os
 from wekaI import Weka
 import itertools
+import layout
+import qtable
+import features
 
 class NullGraphics:
     "Placeholder for graphics"
@@ -42,7 +45,7 @@ class KeyboardInference(inference.InferenceModule):
     """
     def initializeUniformly(self, gameState):
         "Begin with a uniform distribution over ghost positions."
-        self.beliefs = util.Counter()
+        self.beliefs = util.LeanCounter()
         for p in self.legalPositions: self.beliefs[p] = 1.0
         self.beliefs.normalize()
 
@@ -50,7 +53,7 @@ class KeyboardInference(inference.InferenceModule):
         noisyDistance = observation
         emissionModel = busters.getObservationDistribution(noisyDistance)
         pacmanPosition = gameState.getPacmanPosition()
-        allPossible = util.Counter()
+        allPossible = util.LeanCounter()
         for p in self.legalPositions:
             trueDistance = util.manhattanDistance(p, pacmanPosition)
             if emissionModel[trueDistance] > 0:
@@ -129,76 +132,15 @@ class BustersKeyboardAgent(BustersAgent, KeyboardAgent):
         return KeyboardAgent.getAction(self, gameState)
 
     def printHeader(self):
-        header = "width,height,pacman_x,pacman_y,legal_1,legal_2,legal_3,legal_4,legal_5,facing,n_ghost,p_living,g1_living,g2_living,g3_living,g4_living,g1_x,g1_y,g2_x,g2_y,g3_x,g3_y,g4_x,g4_y,g1_m,g2_m,g3_m,g4_m,d_g1,d_g2,d_g3,d_g4,n_food,d_food,north_wall,south_wall,east_wall,west_wall,val,action"
-        return header
+        return features.HEADER
 
     def printLineData(self):
         return self.line
 
     def getLineData(self,file,gameState,action):
-        val, idx = min((val, idx) for (idx, val) in enumerate(gameState.data.ghostDistances) if val != None)
-        width, height = gameState.data.layout.width, gameState.data.layout.height
-        legal = [None, None, None, None, None]
-        self.line = []
-        #West, Stop, East, North, South
-
-       	if 'West' in gameState.getLegalPacmanActions():
-       		legal [0] = 'West'
-       	if 'Stop' in gameState.getLegalPacmanActions():
-       		legal [1] = 'Stop'
-       	if 'East' in gameState.getLegalPacmanActions():
-       		legal [2] = 'East'
-       	if 'North' in gameState.getLegalPacmanActions():
-       		legal [3] = 'North'
-       	if 'South' in gameState.getLegalPacmanActions():
-       		legal [4] = 'South'
-
-        distances = [i if i is not None else 0 for i in gameState.data.ghostDistances ]
-
-        self.line.append(str(width))
-        self.line.append(str(height))
-        self.line.append(str(gameState.getPacmanPosition()[0]))
-        self.line.append(str(gameState.getPacmanPosition()[1]))
-        self.line.extend(map(str,legal))
-        self.line.append(gameState.data.agentStates[0].getDirection())
-        self.line.append(str(gameState.getNumAgents() - 1))
-        self.line.extend(map(str,gameState.getLivingGhosts()))
-        self.line.extend(map(str,[i for sub in gameState.getGhostPositions() for i in sub]))
-        self.line.extend(map(str,[gameState.getGhostDirections().get(i) for i in range(0, gameState.getNumAgents() - 1)]))
-        self.line.extend((map(str,distances)))
-        self.line.append(str(gameState.getNumFood()))
-        if gameState.getNumFood()>0:
-            self.line.append(str(gameState.getDistanceNearestFood()))
-        else:
-            self.line.append(str(9999))
-
-        #paredes alrededor de PacMan
-        #norte
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1]+1]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-        #sur
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1]-1]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-        #este
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]+1][gameState.getPacmanPosition()[1]]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-        #oeste
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]-1][gameState.getPacmanPosition()[1]]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-
-        self.line.append(str(val))
-        self.line.append(str(action))
-        self.line.append(str(gameState.getScore()))
-
-        #print self.line[9]
+        extractor = features.getExtractor(gameState.getNumAgents() - 1)
+        extractor.extract(gameState, action)
+        self.line = extractor.format()
         return self.line
 
 from distanceCalculator import Distancer
@@ -243,6 +185,18 @@ class RandomPAgent(BustersAgent):
         if   ( move_random == 3 ) and Directions.SOUTH in legal: move = Directions.SOUTH
         return move
 
+# The attributes BasicAgentAA leaves out of its lines
+BASIC_EXCLUDED = ['width', 'height', 'n_ghost', 'p_living', 'val', 'action', 'score']
+
+def lineData(gameState):
+    """
+    Returns the values BasicAgentAA writes for gameState, in printHeader
+    order (without width, height, n_ghost, p_living, val and action).
+    """
+    extractor = features.getExtractor(gameState.getNumAgents() - 1)
+    extractor.extract(gameState)
+    return extractor.decode([i for i, name in enumerate(extractor.names) if name not in BASIC_EXCLUDED])
+
 class BasicAgentAA(BustersAgent):
 
     line = []
@@ -272,72 +226,11 @@ class BasicAgentAA(BustersAgent):
 
 
     def printHeader(self):
-        header = "width,height,pacman_x,pacman_y,legal_1,legal_2,legal_3,legal_4,legal_5,facing,n_ghost,p_living,g1_living,g2_living,g3_living,g4_living,g1_x,g1_y,g2_x,g2_y,g3_x,g3_y,g4_x,g4_y,g1_m,g2_m,g3_m,g4_m,d_g1,d_g2,d_g3,d_g4,n_food,d_food,north_wall,south_wall,east_wall,west_wall,val,action"
-        return header
+        return features.HEADER
 
 
     def getLineData(self,gameState,action):
-        val, idx = min((val, idx) for (idx, val) in enumerate(gameState.data.ghostDistances) if val != None)
-        width, height = gameState.data.layout.width, gameState.data.layout.height
-        legal = [None, None, None, None, None]
-        self.line = []
-
-
-        #West, Stop, East, North, South
-       	if 'West' in gameState.getLegalPacmanActions():
-       		legal [0] = 'West'
-       	if 'Stop' in gameState.getLegalPacmanActions():
-       		legal [1] = 'Stop'
-       	if 'East' in gameState.getLegalPacmanActions():
-       		legal [2] = 'East'
-       	if 'North' in gameState.getLegalPacmanActions():
-       		legal [3] = 'North'
-       	if 'South' in gameState.getLegalPacmanActions():
-       		legal [4] = 'South'
-
-        distances = [i if i is not None else 0 for i in gameState.data.ghostDistances ]
-        #self.line.append(str(width))
-        #self.line.append(str(height))
-        self.line.append(gameState.getPacmanPosition()[0])
-        self.line.append(gameState.getPacmanPosition()[1])
-        self.line.extend(map(str,legal))
-        self.line.append(str(gameState.data.agentStates[0].getDirection()))
-       # self.line.append(str(gameState.getNumAgents() - 1))
-        self.line.extend(map(str,gameState.getLivingGhosts()[1:]))
-        self.line.extend([i for sub in gameState.getGhostPositions() for i in sub])
-        self.line.extend(map(str,[gameState.getGhostDirections().get(i) for i in range(0, gameState.getNumAgents() - 1)]))
-        self.line.extend(distances)
-        self.line.append(gameState.getNumFood())
-        if gameState.getNumFood()>0:
-            self.line.append(gameState.getDistanceNearestFood())
-        else:
-            self.line.append(9999)
-
-        #paredes alrededor de PacMan
-        #norte
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1]+1]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-        #sur
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1]-1]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-        #este
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]+1][gameState.getPacmanPosition()[1]]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-        #oeste
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]-1][gameState.getPacmanPosition()[1]]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-
-       # self.line.append(str(val))
-       #self.line.append(str(action))
-       # self.line.append(str(gameState.getScore()))
+        self.line = lineData(gameState)
         return self.line
 
     def chooseAction(self, gameState):
@@ -461,8 +354,66 @@ class BasicAgentAA(BustersAgent):
 
 import math
 
+def encodeFeatures(gameState, xPosition, yPosition, ghostDistances):
+    """
+    The 7 features of QLearningAgent's state for Pacman at (xPosition, yPosition):
+        state[0]: nearest ghost 0 = west 1 = east
+        state[1]: nearest ghost 0 = south 1 = north
+        state[2..5]: walls north, south, east and west of Pacman
+        state[6]: 2 = nearest ghost at distance <= 1, 1 = closer than 6, else 0
+    ghostDistances are the noisy distances of the state; once every ghost is
+    caught the ghost features are 0.
+    """
+    distances = [(val, idx) for (idx, val) in enumerate(ghostDistances) if val != None]
+    if distances: val, idx = min(distances)
+
+    mask = gameState.data.layout.getWallMasks()[gameState.getPacmanPosition()]
+    state=[0,0,0,0,0,0,0]
+    #fantasma1
+    if gameState.getNumAgents() - 1 > 0 and distances:
+        if gameState.getLivingGhosts()[idx] == True and gameState.getGhostPositions()[0] != None:
+            #fantasma1 este/oeste
+            if gameState.getGhostPositions()[idx][0] >= xPosition:
+                state[0] = 1
+            else:
+                state[0] = 0
+            #fantasma1 norte/sur
+            if gameState.getGhostPositions()[idx][1] >= yPosition:
+                state[1] = 1
+            else:
+                state[1] = 0
+    else:
+        state[0] = 0
+        state[1] = 0
+    #paredes norte, sur, este y oeste
+    state[2] = int(mask & layout.WALL_NORTH != 0)
+    state[3] = int(mask & layout.WALL_SOUTH != 0)
+    state[4] = int(mask & layout.WALL_EAST != 0)
+    state[5] = int(mask & layout.WALL_WEST != 0)
+
+    if gameState.getNumAgents() - 1 > 0 and distances:
+        if val <= 1 :
+            state[6] = 2
+        if val > 1 and val  < 6:
+            state[6] = 1
+        else:
+            state[6] = 0
+    return state
+
+def generateStates():
+    "Maps the QLearningAgent features, as a string of digits, to Q-table rows"
+    states_b2 = [list(item) for item in itertools.product("01", repeat = 6)]
+    states_b3 = [list(item) for item in itertools.product("012", repeat = 1)]
+    states = [ i+j for (i,j) in itertools.product(states_b2,states_b3)]
+    states = {"".join(map(str,states[i])) : i for i in range(0, len(states))}
+    for i in range(98,120):
+        states.pop(i,None)
+    for i in range(99,120):
+        states.pop(i,None)
+    return states
+
 class QLearningAgent(BustersAgent):
-    def __init__(self, index = 0, inference = "ExactInference", ghostAgents = 4, observeEnable = True, elapseTimeEnable = True):
+    def __init__(self, index = 0, inference = "ExactInference", ghostAgents = 4, observeEnable = True, elapseTimeEnable = True, checkpoint = 0, table = "qtable.npy"):
         self.pacmanX = 0
         self.pacmanY = 0
         self.ghostDistances = None
@@ -474,124 +425,72 @@ class QLearningAgent(BustersAgent):
         self.actions = {"North":0, "East":1, "South":2,"West":3, "Exit":4}
         self.n_gameStates = 2**4
         self.n_actions = len(self.actions)
-        self.table_file = open("qtable.txt","r+")
-        self.q_table = self.readQtable()
+        # table is the .npy file to train, or a qtable.QTable to train in place
+        # (e.g. the shared table of parallelTraining.py)
+        if isinstance(table, qtable.QTable):
+            self.table_path = table.path
+            self.q_table = table
+        else:
+            self.table_path = table
+            self.q_table = self.readQtable()
         self.alpha = 0.40 
         self.gamma = 0.5
         #self.epsilon = 0.70
         self.epsilon = 0.65
         self.legalActions = None
+        self.stateCache = {}
         self.dic_states = self.generateStates()
         #print(len(self.dic_states))
+        # Episodes between Q-table flushes when reused over several games
+        # (-n N -a checkpoint=K); 0 only writes the table on exit
+        self.checkpoint = int(checkpoint)
+        self.episodes = 0
         BustersAgent.__init__(self, index, inference, ghostAgents)
 
-    def readQtable(self):
-        table = self.table_file.readlines()
-        q_table = []
+    def registerInitialState(self, gameState):
+        "Resets the per-episode bookkeeping; the Q-table stays in memory"
+        BustersAgent.registerInitialState(self, gameState)
+        self.v_score = [0, 0]
+        self.tick = 0
 
-        for i, line in enumerate(table):
-            row = line.split()
-            row = [float(x) for x in row]
-            q_table.append(row)
+    def final(self, gameState):
+        "Called by Game.run at the end of each episode"
+        self.episodes += 1
+        if self.checkpoint > 0 and self.episodes % self.checkpoint == 0:
+            self.writeQtable()
 
-        return q_table
+    def readQtable(self):
+        "Loads the binary table, importing qtable.txt the first time"
+        return qtable.loadQTable(self.table_path, "qtable.txt")
 
     def writeQtable(self):
-        self.table_file.seek(0)
-        self.table_file.truncate()
-
-        for line in self.q_table:
-            for item in line:
-                self.table_file.write(str(item)+" ")
-            self.table_file.write("\n")
+        self.q_table.save()
 
     def __del__(self):
-	"Destructor. Invokation at the end of each episode"
+	"Destructor. Invokation at the end of the run"
         self.writeQtable()
-        self.table_file.close()
 
     def computePosition(self, xPosition, yPosition, gameState):
-        val, idx = min((val, idx) for (idx, val) in enumerate(self.ghostDistances) if val != None)
-
-        walls = gameState.getWalls()
-        #print(self.ghostDistances)
-        state=[0,0,0,0,0,0,0]
-        """
-        Calcula el estado en el que se encuentra pacman.
-        Version 0:
-            gameState[0]: 0 = south 1 = north
-            gameState[1]: 0 = west 1 = east
-            gameState[2] = ghost_close
-        #fantasma mas cercano al norte
         """
-        #fantasma1
-        if gameState.getNumAgents() - 1 > 0:
-            if gameState.getLivingGhosts()[idx] == True and gameState.getGhostPositions()[0] != None:
-                #fantasma1 este/oeste
-                if gameState.getGhostPositions()[idx][0] >= xPosition:
-                    state[0] = 1
-                else:
-                    state[0] = 0
-                #fantasma1 norte/sur
-                if gameState.getGhostPositions()[idx][1] >= yPosition:
-                    state[1] = 1
-                else:
-                    state[1] = 0
-        else:
-            state[0] = 0
-            state[1] = 0
-        #pared norte
-        if  walls[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1] + 1]:
-            state[2]=1
-        else:
-            state[2] = 0
-        #pared sur
-        if  walls[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1] - 1]:
-            state[3]=1
-        else:
-            state[3] = 0
-        #pared este
-        #print(walls[gameState.getPacmanPosition()[0] +1][gameState.getPacmanPosition()[1]])
-        if  walls[gameState.getPacmanPosition()[0] + 1][gameState.getPacmanPosition()[1]]:
-            state[4]=1
-        else:
-            state[4] = 0
-        #pared oeste
-        if  walls[gameState.getPacmanPosition()[0] - 1][gameState.getPacmanPosition()[1]]:
-            state[5]=1
-        else:
-            state[5] = 0
+        Returns the state number for Pacman at (xPosition, yPosition).
 
-        if gameState.getNumAgents() - 1 > 0:
-            if val <= 1 :
-                state[6] = 2
-            if val > 1 and val  < 6:
-                state[6] = 1
-            else:
-                state[6] = 0
-        st = "".join(map(str,state))
-        #print(st)
-        #print(self.dic_states.get(st))
-        #for index in self.dic_states:
-            #print(self.dic_states[index])
-            #if self.dic_states[index] == st:
-                #print(index)
-                #return index
-        #print(self.dic_states[st])
+        The encoding only changes once per tick, so it is cached for the
+        gameState of the current getAction and the Q lookups of that tick
+        reuse it instead of re-reading walls and ghost positions.
+        """
+        key = (xPosition, yPosition)
+        if gameState is not self.g_state:
+            return self.encodePosition(xPosition, yPosition, gameState)
+        if key not in self.stateCache:
+            self.stateCache[key] = self.encodePosition(xPosition, yPosition, gameState)
+        return self.stateCache[key]
+
+    def encodePosition(self, xPosition, yPosition, gameState):
+        st = "".join(map(str, encodeFeatures(gameState, xPosition, yPosition, self.ghostDistances)))
         return(self.dic_states[st])
 
     def generateStates(self):
-        b_3 = [0,1,2]
-        b_2 = [0,1]
-        states_b2 = [list(item) for item in itertools.product("01", repeat = 6)]
-        states_b3 = [list(item) for item in itertools.product("012", repeat = 1)]
-        states = [ i+j for (i,j) in itertools.product(states_b2,states_b3)]
-        states = {"".join(map(str,states[i])) : i for i in range(0, len(states))}
-        for i in range(98,120):
-            states.pop(i,None)
-        for i in range(99,120):
-            states.pop(i,None)
-        return states
+        return generateStates()
 
     def getQValue(self, state, action):
 
@@ -614,7 +513,7 @@ class QLearningAgent(BustersAgent):
         """
         if len(self.legalActions)==0:
           return 0
-        return max(self.q_table[self.computePosition(self.pacmanX, self.pacmanY,self.g_state)])
+        return self.q_table.maxValue(self.computePosition(self.pacmanX, self.pacmanY,self.g_state))
 
     def computeActionFromQValues(self, state):
         """
@@ -672,7 +571,7 @@ class QLearningAgent(BustersAgent):
         val, idx = min((val, idx) for (idx, val) in enumerate(self.ghostDistances) if val != None)
         reward = 0.0
         max_distance =math.sqrt(gameState.data.layout.width**2 + gameState.data.layout.height**2)
-        walls = gameState.getWalls()
+        mask = gameState.data.layout.getWallMasks()[gameState.getPacmanPosition()]
         dist = max_distance - val #+ 6
         factor = 1
         #print(dist)
@@ -681,7 +580,9 @@ class QLearningAgent(BustersAgent):
         #Si el fantasma mas cercano esta vivo (evita errores)
         if(gameState.getLivingGhosts()[idx] != None):
             #si pacman esta encerrado entre dos paredes
-            if ((walls[gameState.getPacmanPosition()[0]-1][gameState.getPacmanPosition()[1]] and walls[gameState.getPacmanPosition()[0]+1][gameState.getPacmanPosition()[1]]) or (walls[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1]+1] and  walls[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1]-1])):
+            eastWest = layout.WALL_EAST | layout.WALL_WEST
+            northSouth = layout.WALL_NORTH | layout.WALL_SOUTH
+            if mask & eastWest == eastWest or mask & northSouth == northSouth:
                 #reward = reward - dist - 30
             #si pacman esta en la misma altura o ancho del fantasma mas cercano
                 if gameState.getPacmanPosition()[1] == gameState.getGhostPositions()[idx][1]:
@@ -693,7 +594,7 @@ class QLearningAgent(BustersAgent):
                     elif val < 2:
                         reward = reward + dist + 25
             #si pacman esta en contacto con alguna pared
-            elif walls[gameState.getPacmanPosition()[0]-1][gameState.getPacmanPosition()[1]] or walls[gameState.getPacmanPosition()[0]+1][gameState.getPacmanPosition()[1]] or walls[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1]+1] or walls[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1]-1]:
+            elif mask:
                 #reward = reward -dist - 10
                 if gameState.getPacmanPosition()[1] == gameState.getGhostPositions()[idx][1]:
                     #reward = reward -dist 
@@ -740,6 +641,7 @@ class QLearningAgent(BustersAgent):
         """
         #obtener datos necesarios de gameState
         self.g_state = gameState
+        self.stateCache = {}
         #rint(self.g_state.data.getLivingGhosts())
         #print(self.g_state.getNumAgents())
         self.v_score[self.tick % 2] = self.g_state.getScore()
@@ -19,6 +19,8 @@ import inference
 import busters
 import os
 from wekaI import Weka
+import wekaNative
+import features
 
 class NullGraphics:
     "Placeholder for graphics"
@@ -429,6 +431,25 @@ class BasicAgentAA(BustersAgent):
 class MLAgent (BustersAgent):
     line = []
     legal = [None,None,None,None,None]
+    model = '../p1/models/meta_naiveBayes.model'
+    arff = '../p1/training/training_keyboard_ff.arff'
+    # The model exported by wekaNative.py, used instead of Weka if present
+    nativeModel = '../p1/models/meta_naiveBayes.json'
+    session = None
+
+    def getSession(self):
+        """
+        Loads the model on the first prediction and keeps it for the later
+        moves: the exported nativeModel if there is one, else the Weka model,
+        starting the JVM.
+        """
+        if self.session is None and os.path.exists(self.nativeModel):
+            self.session = wekaNative.loadModel(self.nativeModel)
+        if self.session is None:
+            self.weka = Weka()
+            self.weka.start_jvm()
+            self.session = self.weka.session(self.model, self.arff)
+        return self.session
 
     def registerInitialState(self, gameState):
         BustersAgent.registerInitialState(self, gameState)
@@ -440,69 +461,12 @@ class MLAgent (BustersAgent):
         return self.line
 
     def chooseAction(self, gameState):
+        extractor = features.getExtractor(gameState.getNumAgents() - 1)
+        extractor.extract(gameState)
+        # Every attribute but the action and the score
+        self.line = extractor.format(range(len(extractor.names) - 2))
 
-        val, idx = min((val, idx) for (idx, val) in enumerate(gameState.data.ghostDistances) if val != None)
-        width, height = gameState.data.layout.width, gameState.data.layout.height
-        legal = [None, None, None, None, None]
-        self.line = []
-
-
-        #West, Stop, East, North, South
-       	if 'West' in gameState.getLegalPacmanActions():
-       		legal [0] = 'West'
-       	if 'Stop' in gameState.getLegalPacmanActions():
-       		legal [1] = 'Stop'
-       	if 'East' in gameState.getLegalPacmanActions():
-       		legal [2] = 'East'
-       	if 'North' in gameState.getLegalPacmanActions():
-       		legal [3] = 'North'
-       	if 'South' in gameState.getLegalPacmanActions():
-       		legal [4] = 'South'
-
-        distances = [i if i is not None else 0 for i in gameState.data.ghostDistances ]
-
-        self.line.append(str(width))
-        self.line.append(str(height))
-        self.line.append(str(gameState.getPacmanPosition()[0]))
-        self.line.append(str(gameState.getPacmanPosition()[1]))
-        self.line.extend(legal)
-        self.line.append(gameState.data.agentStates[0].getDirection())
-        self.line.append(str(gameState.getNumAgents() - 1))
-        self.line.extend(map(str,gameState.getLivingGhosts()))
-        self.line.extend(map(str,[i for sub in gameState.getGhostPositions() for i in sub]))
-        self.line.extend(map(str,[gameState.getGhostDirections().get(i) for i in range(0, gameState.getNumAgents() - 1)]))
-        self.line.extend((map(str,distances)))
-        self.line.append(str(gameState.getNumFood()))
-        if gameState.getNumFood()>0:
-            self.line.append(str(gameState.getDistanceNearestFood()))
-        else:
-            self.line.append(str(9999))
-        #paredes alrededor de PacMan
-        #norte
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1]+1]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-        #sur
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]][gameState.getPacmanPosition()[1]-1]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-        #este
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]+1][gameState.getPacmanPosition()[1]]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-        #oeste
-        if gameState.getWalls()[gameState.getPacmanPosition()[0]-1][gameState.getPacmanPosition()[1]]:
-            self.line.append(str(True))
-        else:
-            self.line.append(str(False))
-        self.line.append(str(val))
-        #print gameState.getScore()
-
-
-        move = self.weka.predict('../p1/models/meta_naiveBayes.model',self.line,'../p1/training/training_keyboard_ff.arff')
+        move = self.getSession().predict(self.line)
         #weka.stop_jvm()
         #print move
         return move
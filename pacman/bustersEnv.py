@@ -0,0 +1,113 @@
+# bustersEnv.py
+# -------------
+
+"""
+A reset/step interface to busters games, for training loops that drive
+Pacman themselves instead of handing an agent to Game.run:
+
+  env = BustersEnv([RandomGhost(i + 1) for i in range(4)], QLearningEncoder())
+  observation = env.reset(layout.getLayout('laberynths/labAA3'))
+  while True:
+      action = random.choice(env.getLegalActions())
+      observation, reward, done, info = env.step(action)
+      if done: break
+
+The game is set up by BustersGameRules.newGame and played by the same
+rules as a FastGame: Pacman moves, then each ghost moves on the live state
+until the game is over.  States are never deep-copied, and the encoders
+fill the same observation buffer on every step, so an observation must be
+copied if it is to be kept past the next step.
+"""
+
+import numpy
+import busters
+import bustersAgents
+import features
+
+class QLearningEncoder:
+    """
+    Encodes a state as the 7 features QLearningAgent learns on (see
+    bustersAgents.encodeFeatures), in an int8 array.  stateIndex gives the
+    Q-table row of the last encoded state.
+    """
+
+    def __init__( self ):
+        self.features = numpy.zeros(7, dtype=numpy.int8)
+        self.states = bustersAgents.generateStates()
+        self.stateIndex = None
+
+    def reset( self, state ):
+        pass
+
+    def encode( self, state ):
+        x, y = state.getPacmanPosition()
+        values = bustersAgents.encodeFeatures(state, x, y, state.getNoisyGhostDistances())
+        self.features[:] = values
+        self.stateIndex = self.states["".join(map(str, values))]
+        return self.features
+
+class LineDataEncoder:
+    """
+    Encodes a state as the attributes BasicAgentAA writes for it (see
+    bustersAgents.lineData), typed as in features.FeatureExtractor: a
+    float64 array holding numbers and the codes of nominal values.
+    """
+
+    def __init__( self ):
+        self.line = None
+
+    def reset( self, state ):
+        self.extractor = features.getExtractor(state.getNumAgents() - 1)
+        self.columns = [i for i, name in enumerate(self.extractor.names) if name not in bustersAgents.BASIC_EXCLUDED]
+        self.line = numpy.zeros(len(self.columns), dtype=numpy.float64)
+
+    def encode( self, state ):
+        numpy.take(self.extractor.extract(state), self.columns, out=self.line)
+        return self.line
+
+class BustersEnv:
+    """
+    One busters game at a time, played one Pacman action per step.
+
+    The reward of a step is the change of the score over Pacman's move and
+    the ghosts' replies; info holds the current state and whether the game
+    was won.
+    """
+
+    def __init__( self, ghostAgents, encoder=None, maxMoves=-1 ):
+        self.ghostAgents = ghostAgents
+        self.encoder = encoder or QLearningEncoder()
+        self.maxMoves = maxMoves
+        self.rules = busters.BustersGameRules()
+        self.game = None
+
+    def reset( self, layout ):
+        "Starts a new game on layout and returns its first observation"
+        ghosts = self.ghostAgents[:layout.getNumGhosts()]
+        self.game = self.rules.newGame( layout, None, ghosts, None, self.maxMoves, fast=True )
+        for ghost in ghosts:
+            if hasattr(ghost, 'registerInitialState'):
+                ghost.registerInitialState(self.game.state)
+        self.encoder.reset(self.game.state)
+        return self.encoder.encode(self.game.state)
+
+    def step( self, action ):
+        "Plays action for Pacman, then the ghosts; returns (observation, reward, done, info)"
+        game = self.game
+        if game is None or game.gameOver:
+            raise Exception('The game is over; call reset to start a new one')
+        score = game.state.getScore()
+        game.state = game.state.generateSuccessor( 0, action )
+        self.rules.process( game.state, game )
+        for agentIndex in range( 1, len(game.agents) ):
+            if game.gameOver: break
+            ghostAction = game.agents[agentIndex].getAction( game.state )
+            game.state = game.state.generateSuccessor( agentIndex, ghostAction )
+            self.rules.process( game.state, game )
+
+        state = game.state
+        info = { 'state': state, 'win': state.isWin() }
+        return self.encoder.encode(state), state.getScore() - score, game.gameOver, info
+
+    def getLegalActions( self ):
+        return self.game.state.getLegalPacmanActions()
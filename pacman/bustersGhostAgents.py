@@ -20,7 +20,7 @@ import util
 
 class StationaryGhost( ghostAgents.GhostAgent ):
     def getDistribution( self, state ):
-        dist = util.Counter()
+        dist = util.LeanCounter()
         dist[Directions.STOP] = 1.0
         return dist
 
@@ -53,7 +53,7 @@ class DispersingGhost( ghostAgents.GhostAgent ):
 
         bestDistance = min(sumOfDistances)
         numBest = [bestDistance == dist for dist in sumOfDistances].count(True)
-        distribution = util.Counter()
+        distribution = util.LeanCounter()
         for action, distance in zip(legalActions, sumOfDistances):
             if distance == bestDistance: distribution[action] += self.spreadProb / numBest
             distribution[action] += (1 - self.spreadProb) / len(legalActions)
@@ -0,0 +1,218 @@
+# datasets.py
+# -----------
+
+"""
+Writers for the datasets recorded while playing.
+
+Rows are kept in a bounded in-memory buffer and written in bulk when it
+fills up (and on close), optionally by a background thread so that the
+game loop only pays for appending to a list:
+
+  writer = ArffWriter('training.arff', features.getExtractor(4))
+  ...
+  writer.writeFeatures()          # every move, after extractor.extract
+  ...
+  writer.close()
+
+DatasetWriter writes text rows (ARFF data lines or CSV) and NpzWriter
+stores the typed feature arrays in binary, column by column, in chunks of
+.npz files that readNpz joins back.
+"""
+
+import glob, os, sys, threading, Queue
+import numpy
+
+class DatasetWriter:
+    """
+    Appends comma separated rows to a text file, bufferSize rows at a time.
+
+    header is written first if the file is new or empty.  With background,
+    a thread does the writing, with at most queueSize batches waiting.
+    """
+    file = None
+    worker = None
+
+    def __init__( self, path, header=None, bufferSize=1000, background=False, queueSize=8 ):
+        isEmpty = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a')
+        if header is not None and isEmpty:
+            self.file.write(header)
+        self.bufferSize = bufferSize
+        self.buffer = []
+        self.worker = background and BackgroundWriter(writeText, self.file, queueSize)
+
+    def write( self, row ):
+        "Adds a row, given as a list of strings"
+        self.buffer.append(','.join(row) + '\n')
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def flush( self ):
+        "Hands the buffered rows to the file (or to the background thread)"
+        if not self.buffer: return
+        text = ''.join(self.buffer)
+        self.buffer = []
+        if self.worker:
+            self.worker.put(text)
+        else:
+            writeText(self.file, text)
+
+    def close( self ):
+        if self.file is None: return
+        try:
+            self.flush()
+            if self.worker:
+                self.worker.close()
+        finally:
+            self.file.close()
+            self.file = None
+
+    def __del__( self ):
+        # Like a file, a writer dropped without close keeps its rows; one
+        # with a background thread must be closed explicitly
+        if not self.worker:
+            self.close()
+
+class ArffWriter(DatasetWriter):
+    """
+    Writes the attributes of a features.FeatureExtractor (those of columns,
+    all by default) as ARFF, declaring them in the header of a new file.
+    """
+
+    def __init__( self, path, extractor, relation='busters', columns=None, **options ):
+        if columns is None: columns = range(len(extractor.names))
+        self.extractor = extractor
+        self.columns = columns
+        DatasetWriter.__init__(self, path, self.getHeader(relation), **options)
+
+    def getHeader( self, relation ):
+        return self.extractor.arffHeader(relation, self.columns)
+
+    def writeFeatures( self ):
+        "Adds a row with the values last extracted"
+        self.write(self.extractor.format(self.columns))
+
+class CsvWriter(ArffWriter):
+    "Writes the attributes of a features.FeatureExtractor as CSV, with a header line of names"
+
+    def getHeader( self, relation ):
+        return ','.join([self.extractor.names[i] for i in self.columns]) + '\n'
+
+class NpzWriter:
+    """
+    Stores rows of numbers (such as the arrays of a FeatureExtractor) in
+    binary, chunkSize rows per file: prefix.00000.npz, prefix.00001.npz...
+    Every file holds one array per column, named by names.
+    """
+    chunk = None
+    worker = None
+
+    def __init__( self, prefix, names, chunkSize=10000, background=False, queueSize=8 ):
+        self.prefix = prefix
+        self.names = names
+        self.chunk = numpy.zeros((chunkSize, len(names)), dtype=numpy.float64)
+        self.numRows = 0
+        self.numChunks = len(chunkPaths(prefix))
+        self.worker = background and BackgroundWriter(saveChunk, names, queueSize)
+
+    def write( self, values ):
+        self.chunk[self.numRows] = values
+        self.numRows += 1
+        if self.numRows == len(self.chunk):
+            self.flush()
+
+    def flush( self ):
+        "Saves the rows written so far as a new chunk"
+        if self.numRows == 0: return
+        path = '%s.%05d.npz' % (self.prefix, self.numChunks)
+        rows = self.chunk[:self.numRows]
+        if self.worker:
+            self.worker.put((path, rows.copy()))
+        else:
+            saveChunk(self.names, (path, rows))
+        self.numChunks += 1
+        self.numRows = 0
+
+    def close( self ):
+        if self.chunk is None: return
+        try:
+            self.flush()
+            if self.worker:
+                self.worker.close()
+        finally:
+            self.chunk = None
+
+    def __del__( self ):
+        if not self.worker:
+            self.close()
+
+def chunkPaths(prefix):
+    return sorted(glob.glob(prefix + '.[0-9][0-9][0-9][0-9][0-9].npz'))
+
+def readNpz(prefix):
+    "Returns the columns stored by an NpzWriter, as a dict of arrays"
+    chunks = [numpy.load(path) for path in chunkPaths(prefix)]
+    if not chunks: raise Exception('No chunks found for ' + prefix)
+    return dict([(name, numpy.concatenate([chunk[name] for chunk in chunks])) for name in chunks[0].files])
+
+def writeText(f, text):
+    f.write(text)
+
+def saveChunk(names, chunk):
+    path, rows = chunk
+    f = open(path, 'wb')
+    try: numpy.savez(f, **dict([(name, rows[:, i]) for i, name in enumerate(names)]))
+    finally: f.close()
+
+class BackgroundWriter:
+    """
+    A thread calling write(target, batch) for each batch put, in order.
+    It keeps no reference to the writer using it, which can then be
+    collected normally.
+
+    If a write fails the thread stops, and the error is raised by the next
+    put or by close.
+    """
+
+    def __init__( self, write, target, queueSize ):
+        self.queue = Queue.Queue(queueSize)
+        self.errors = []
+        self.thread = threading.Thread(target=writeBatches, args=(self.queue, write, target, self.errors))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put( self, batch ):
+        # Never block on a full queue once the thread is gone
+        while True:
+            self.check()
+            try:
+                self.queue.put(batch, timeout=0.1)
+                return
+            except Queue.Full:
+                pass
+
+    def close( self ):
+        self.put(None)
+        self.thread.join()
+        self.raiseError()
+
+    def check( self ):
+        "Raises the error that stopped the thread if it is not running"
+        self.raiseError()
+        if not self.thread.is_alive():
+            raise Exception('The background writer has stopped')
+
+    def raiseError( self ):
+        if self.errors:
+            error = self.errors[0]
+            raise error[0], error[1], error[2]
+
+def writeBatches(queue, write, target, errors):
+    while True:
+        batch = queue.get()
+        if batch is None: break
+        try:
+            write(target, batch)
+        except:
+            errors.append(sys.exc_info())
+            break
@@ -31,6 +31,7 @@ distances.
 """
 
 import threading, sys, time, random
+import array, hashlib, os
 
 class Distancer:
   def __init__(self, layout, background=True, default=10000):
@@ -75,11 +76,10 @@ class Distancer:
     return bestDistance
 
   def getDistanceOnGrid(self, pos1, pos2):
-    key = (pos1, pos2)
-    if key in self._distances:
-      return self._distances[key]
-    else:
-      raise Exception("Positions not in grid: " + str(key))
+    try:
+      return self._distances.getDistance(pos1, pos2)
+    except KeyError:
+      raise Exception("Positions not in grid: " + str((pos1, pos2)))
 
   def isReadyForMazeDistance(self):
     return self._distances != None
@@ -131,7 +131,10 @@ class DistanceCalculator(threading.Thread):
       if distanceThread != None: raise Exception('Multiple distance threads')
       distanceThread = self
 
-      distances = computeDistances(self.layout)
+      distances = loadDistances(self.layout)
+      if distances == None:
+        distances = computeDistances(self.layout)
+        saveDistances(self.layout, distances)
       #print >>sys.stdout, '[Distancer]: Switching to maze distances'
 
       distanceMap[self.layout.walls] = distances
@@ -142,46 +145,112 @@ class DistanceCalculator(threading.Thread):
     distanceMapSemaphore.release()
     self.distancer._distances = distances
 
+UNREACHABLE = -1
+
+class DistanceMatrix:
+  """
+  All-pairs maze distances of a layout.
+
+  The distances live in a flat int16 array of size V x V, where V is the
+  number of legal cells and cellIndex maps each cell to its row and column.
+  Reading a distance is two dict lookups and one array index, and the whole
+  table of a big maze takes a couple of bytes per pair instead of a dict
+  entry keyed by a pair of tuples.
+  """
+  def __init__(self, cells, distances):
+    self.cells = cells
+    self.cellIndex = dict([(cell, i) for i, cell in enumerate(cells)])
+    self.size = len(cells)
+    self.distances = distances
+
+  def getDistance(self, pos1, pos2):
+    "Raises KeyError if a position is not a legal cell of the maze"
+    distance = self.distances[self.cellIndex[pos1] * self.size + self.cellIndex[pos2]]
+    if distance == UNREACHABLE:
+      return sys.maxint
+    return distance
+
+  # The old distances were a dict keyed by (pos1, pos2); keep that interface
+  def __contains__(self, key):
+    pos1, pos2 = key
+    return pos1 in self.cellIndex and pos2 in self.cellIndex
+
+  def __getitem__(self, key):
+    return self.getDistance(key[0], key[1])
+
 def computeDistances(layout):
-    distances = {}
-    allNodes = layout.walls.asList(False)
-    for source in allNodes:
-        dist = {}
-        closed = {}
-        for node in allNodes:
-            dist[node] = sys.maxint
-        import util
-        queue = util.PriorityQueue()
-        queue.push(source, 0)
-        dist[source] = 0
-        while not queue.isEmpty():
-            node = queue.pop()
-            if node in closed:
-                continue
-            closed[node] = True
-            nodeDist = dist[node]
-            adjacent = []
-            x, y = node
-            if not layout.isWall((x,y+1)):
-                adjacent.append((x,y+1))
-            if not layout.isWall((x,y-1)):
-                adjacent.append((x,y-1) )
-            if not layout.isWall((x+1,y)):
-                adjacent.append((x+1,y) )
-            if not layout.isWall((x-1,y)):
-                adjacent.append((x-1,y))
-            for other in adjacent:
-                if not other in dist:
-                    continue
-                oldDist = dist[other]
-                newDist = nodeDist+1
-                if newDist < oldDist:
-                    dist[other] = newDist
-                    queue.push(other, newDist)
-        for target in allNodes:
-            distances[(target, source)] = dist[target]
-    return distances
+    """
+    Runs a breadth-first search from every legal cell (the maze is a
+    unit-weight graph) and returns the distances as a DistanceMatrix.
+    """
+    cells = layout.walls.asList(False)
+    cellIndex = dict([(cell, i) for i, cell in enumerate(cells)])
+    neighbors = layout.getNeighbors()
+    adjacent = [[cellIndex[other] for other in neighbors[cell]] for cell in cells]
+    size = len(cells)
+    distances = array.array('h')
+    for source in range(size):
+        row = [UNREACHABLE] * size
+        row[source] = 0
+        frontier = [source]
+        distance = 0
+        while frontier:
+            distance += 1
+            nextFrontier = []
+            for node in frontier:
+                for other in adjacent[node]:
+                    if row[other] == UNREACHABLE:
+                        row[other] = distance
+                        nextFrontier.append(other)
+            frontier = nextFrontier
+        distances.fromlist(row)
+    return DistanceMatrix(cells, distances)
+
+
+##########################################
+# PERSISTENT CACHE OF MAZE DISTANCES     #
+##########################################
+
+# Directory holding one file of raw int16 distances per maze, so a new
+# process does not recompute the distances of a maze it has seen before.
+# Set PACMAN_DISTANCE_CACHE to an empty string to disable it.
+DISTANCE_CACHE_DIR = os.environ.get('PACMAN_DISTANCE_CACHE',
+                                    os.path.join(os.path.expanduser('~'), '.cache', 'pacman-distances'))
+
+def distanceCacheFile(layout):
+  "The cache file of a layout, named after a hash of its walls"
+  walls = layout.walls
+  key = hashlib.sha1('%d %d\n%s' % (walls.width, walls.height, str(walls))).hexdigest()
+  return os.path.join(DISTANCE_CACHE_DIR, key + '.int16')
+
+def loadDistances(layout):
+  "Returns the cached DistanceMatrix of a layout, or None if there is none"
+  if not DISTANCE_CACHE_DIR: return None
+  cells = layout.walls.asList(False)
+  distances = array.array('h')
+  try:
+    f = open(distanceCacheFile(layout), 'rb')
+    try: distances.fromfile(f, len(cells) * len(cells))
+    finally: f.close()
+  except (IOError, OSError, EOFError):
+    return None
+  return DistanceMatrix(cells, distances)
 
+def saveDistances(layout, matrix):
+  "Stores a DistanceMatrix in the cache; failures just skip the cache"
+  if not DISTANCE_CACHE_DIR: return
+  fileName = distanceCacheFile(layout)
+  try:
+    if not os.path.isdir(DISTANCE_CACHE_DIR):
+      os.makedirs(DISTANCE_CACHE_DIR)
+    # Write to a private file first so readers never see a partial table
+    tempName = '%s.%d.tmp' % (fileName, os.getpid())
+    f = open(tempName, 'wb')
+    try: matrix.distances.tofile(f)
+    finally: f.close()
+    os.rename(tempName, fileName)
+  except (IOError, OSError):
+    pass
 
 def getDistanceOnGrid(distances, pos1, pos2):
     key = (pos1, pos2)
@@ -0,0 +1,158 @@
+# episodes.py
+# -----------
+
+"""
+A columnar store of the per-tick rows recorded while playing, from which
+training sets with lagged or leading targets are built after the games.
+
+Each tick is recorded once, as it was observed; targets such as "the
+score in N ticks" or "the next action" are then materialized as vectorized
+shifts within each episode, so several training sets can be taken from one
+recording without replaying the games:
+
+  store = EpisodeStore(extractor.names)
+  for each game:
+      store.startEpisode()
+      for each tick:
+          store.record(extractor.extract(gameState, action))
+  X = store.table(['pacman_x', 'pacman_y', ...], [('score', 1), ('action', 1)])
+"""
+
+import numpy
+import datasets, features
+
+class EpisodeStore:
+    """
+    Rows of the columns in names, one per tick, tagged with their episode
+    and tick number.  Rows are typed by dtype: float64 for the arrays of a
+    features.FeatureExtractor, object for rows of strings such as those of
+    the agents' printLineData.
+    """
+
+    def __init__( self, names, dtype=numpy.float64, capacity=1024 ):
+        self.names = list(names)
+        self.columns = dict([(name, i) for i, name in enumerate(self.names)])
+        self.dtype = numpy.dtype(dtype)
+        self.data = numpy.empty((capacity, len(self.names)), dtype=self.dtype)
+        self.episodes = numpy.empty(capacity, dtype=numpy.int64)
+        self.ticks = numpy.empty(capacity, dtype=numpy.int64)
+        self.numRows = 0
+        self.episode = 0
+        self.tick = 0
+
+    def startEpisode( self ):
+        "Makes the next rows recorded those of a new episode"
+        if self.tick > 0:
+            self.episode += 1
+            self.tick = 0
+
+    def record( self, values ):
+        "Appends the row of the current tick"
+        if self.numRows == len(self.data):
+            self.grow()
+        self.data[self.numRows] = values
+        self.episodes[self.numRows] = self.episode
+        self.ticks[self.numRows] = self.tick
+        self.numRows += 1
+        self.tick += 1
+
+    def grow( self ):
+        capacity = 2 * len(self.data)
+        for name in ['data', 'episodes', 'ticks']:
+            old = getattr(self, name)
+            new = numpy.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def __len__( self ):
+        return self.numRows
+
+    def column( self, name ):
+        "The values recorded for column name (a view)"
+        return self.data[:self.numRows, self.columns[name]]
+
+    def shift( self, name, offset ):
+        """
+        Column name moved offset ticks within each episode: with offset 1
+        every row gets the value of the next tick (a lead), with -1 that of
+        the previous tick (a lag).  Returns the values and the mask of the
+        rows where that tick exists; the other values are missing (NaN, or
+        None for object rows).
+        """
+        n = self.numRows
+        source = numpy.arange(n) + offset
+        valid = (source >= 0) & (source < n)
+        source = numpy.clip(source, 0, max(n - 1, 0))
+        episodes = self.episodes[:n]
+        valid &= episodes[source] == episodes
+        values = self.column(name)[source]
+        values[~valid] = None if self.dtype == object else numpy.nan
+        return values, valid
+
+    def table( self, columns=None, targets=() ):
+        """
+        The rows with the given columns (all by default) followed by the
+        (name, offset) shifts of targets, keeping only the rows where every
+        target exists.  See getTableNames for the names of its columns.
+        """
+        if columns is None: columns = self.names
+        indices = [self.columns[name] for name in columns]
+        valid = numpy.ones(self.numRows, dtype=bool)
+        shifted = []
+        for name, offset in targets:
+            values, targetValid = self.shift(name, offset)
+            shifted.append(values)
+            valid &= targetValid
+        table = numpy.empty((self.numRows, len(indices) + len(targets)), dtype=self.dtype)
+        table[:, :len(indices)] = self.data[:self.numRows, indices]
+        for i, values in enumerate(shifted):
+            table[:, len(indices) + i] = values
+        return table[valid]
+
+    def getTableNames( self, columns=None, targets=() ):
+        if columns is None: columns = self.names
+        return list(columns) + [targetName(name, offset) for name, offset in targets]
+
+    def writeArff( self, path, schema, columns=None, targets=(), relation='busters' ):
+        """
+        Appends the table of columns and targets to an ARFF file, declaring
+        its attributes (with the categories of the columns in schema, a list
+        of (name, categories) pairs as in features.getSchema) if the file is
+        new.
+        """
+        if columns is None: columns = self.names
+        categories = dict(schema)
+        tableSchema = zip(self.getTableNames(columns, targets),
+                          [categories[name] for name in columns] + [categories[name] for name, offset in targets])
+        writer = datasets.DatasetWriter(path, features.arffHeader(relation, tableSchema))
+        for row in self.table(columns, targets):
+            writer.write([str(features.decodeValue(c, value)) for (name, c), value in zip(tableSchema, row)])
+        writer.close()
+
+    def save( self, path ):
+        "Saves the store as .npz"
+        f = open(path, 'wb')
+        try:
+            numpy.savez(f, names=numpy.array(self.names, dtype=object), data=self.data[:self.numRows],
+                        episodes=self.episodes[:self.numRows], ticks=self.ticks[:self.numRows])
+        finally: f.close()
+
+def loadEpisodes(path):
+    "Loads an EpisodeStore saved by EpisodeStore.save"
+    saved = numpy.load(path, allow_pickle=True)
+    data = saved['data']
+    store = EpisodeStore(list(saved['names']), data.dtype, max(len(data), 1))
+    store.numRows = len(data)
+    store.data[:len(data)] = data
+    store.episodes[:len(data)] = saved['episodes']
+    store.ticks[:len(data)] = saved['ticks']
+    if len(data):
+        store.episode = int(store.episodes[len(data) - 1])
+        store.tick = int(store.ticks[len(data) - 1]) + 1
+    return store
+
+def targetName(name, offset):
+    "The name of a shifted column: score_lead1, action_lag2..."
+    if offset >= 0:
+        return '%s_lead%d' % (name, offset)
+    return '%s_lag%d' % (name, -offset)
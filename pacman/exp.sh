@@ -1,14 +1,20 @@
+# Each invocation reuses one QLearningAgent for EPISODES games, keeping the
+# Q-table in memory and writing it to qtable.npy (the authoritative table,
+# imported from qtable.txt on the first run) every CHECKPOINT episodes and
+# when the invocation ends; qtable.txt itself is not updated
+EPISODES=${EPISODES:-1}
+CHECKPOINT=${CHECKPOINT:-0}
 for VARIABLE in 1 2 3 4 5 6 7 8 9 10
 do
 	echo "ronda numero $VARIABLE"
 	echo "mapa 1"
-	timeout 5m python busters.py -p QLearningAgent -l laberynths/labAA1 -k 1 -g RandomGhost 
+	timeout 5m python busters.py -p QLearningAgent -l laberynths/labAA1 -k 1 -g RandomGhost -q -n $EPISODES -a checkpoint=$CHECKPOINT
 	echo "mapa 2"
-	timeout 5m python busters.py -p QLearningAgent -l laberynths/labAA2 -k 2 -g RandomGhost
+	timeout 5m python busters.py -p QLearningAgent -l laberynths/labAA2 -k 2 -g RandomGhost -q -n $EPISODES -a checkpoint=$CHECKPOINT
 	echo "mapa 4"
-	timeout 5m python busters.py -p QLearningAgent -l laberynths/labAA4 -k 3 -g RandomGhost
+	timeout 5m python busters.py -p QLearningAgent -l laberynths/labAA4 -k 3 -g RandomGhost -q -n $EPISODES -a checkpoint=$CHECKPOINT
 	echo "mapa 5"
-	timeout 5m python busters.py -p QLearningAgent -l laberynths/labAA5 -k 3 -g RandomGhost
+	timeout 5m python busters.py -p QLearningAgent -l laberynths/labAA5 -k 3 -g RandomGhost -q -n $EPISODES -a checkpoint=$CHECKPOINT
 	echo "mapa 3"
-	timeout 5m python busters.py -p QLearningAgent -l laberynths/labAA3 -k 3 -g RandomGhost
+	timeout 5m python busters.py -p QLearningAgent -l laberynths/labAA3 -k 3 -g RandomGhost -q -n $EPISODES -a checkpoint=$CHECKPOINT
 done
@@ -0,0 +1,178 @@
+# features.py
+# -----------
+
+"""
+The per-move attributes the busters agents log and classify on, as typed
+values in a preallocated NumPy array.
+
+The schema is the one of the agents' printHeader (plus the score the
+keyboard agent logs after it), declared once as (name, categories) pairs:
+numeric attributes have no categories and hold their number, nominal ones
+hold the position of their value among the categories.  Values only
+become strings at the output boundary, in format and arffLine:
+
+  features = FeatureExtractor(gameState.getNumAgents() - 1)
+  values = features.extract(gameState, action)   # numpy float64 array
+  f.write(features.arffLine())
+"""
+
+import numpy
+import layout
+from game import Directions
+
+DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+BOOLEANS = ['False', 'True']
+
+# Pacman's legal actions in the order of the legal_1 .. legal_5 attributes
+LEGAL_ORDER = [Directions.WEST, Directions.STOP, Directions.EAST, Directions.NORTH, Directions.SOUTH]
+WALLS = [('north_wall', layout.WALL_NORTH), ('south_wall', layout.WALL_SOUTH),
+         ('east_wall', layout.WALL_EAST), ('west_wall', layout.WALL_WEST)]
+
+# Value of d_food once the food is gone
+NO_FOOD_DISTANCE = 9999
+
+# Written for the values of nominal attributes outside their categories
+MISSING = '?'
+
+def getSchema(numGhosts=4):
+    """
+    The attributes as (name, categories) pairs, categories being None for
+    numeric attributes.  With 4 ghosts the names up to action are those of
+    printHeader.
+    """
+    ghosts = range(1, numGhosts + 1)
+    schema = [('width', None), ('height', None), ('pacman_x', None), ('pacman_y', None)]
+    schema += [('legal_%d' % (i + 1), ['None', action]) for i, action in enumerate(LEGAL_ORDER)]
+    schema += [('facing', DIRECTIONS), ('n_ghost', None), ('p_living', BOOLEANS)]
+    schema += [('g%d_living' % i, BOOLEANS) for i in ghosts]
+    schema += [('g%d_%s' % (i, axis), None) for i in ghosts for axis in 'xy']
+    schema += [('g%d_m' % i, ['None'] + DIRECTIONS) for i in ghosts]
+    schema += [('d_g%d' % i, None) for i in ghosts]
+    schema += [('n_food', None), ('d_food', None)]
+    schema += [(name, BOOLEANS) for name, bit in WALLS]
+    schema += [('val', None), ('action', DIRECTIONS), ('score', None)]
+    return schema
+
+# The attribute names of printHeader
+HEADER = ','.join([name for name, categories in getSchema(4)[:-1]])
+
+_extractors = {}
+def getExtractor(numGhosts):
+    "A FeatureExtractor for numGhosts ghosts, shared by all its callers"
+    if numGhosts not in _extractors:
+        _extractors[numGhosts] = FeatureExtractor(numGhosts)
+    return _extractors[numGhosts]
+
+def decodeValue(categories, value):
+    "A typed value as a Python value, given the categories of its attribute (None if numeric)"
+    if categories is not None:
+        return categories[int(value)] if value >= 0 else MISSING
+    if value != value:
+        return MISSING
+    if value == int(value):
+        return int(value)
+    return float(value)
+
+def arffHeader(relation, schema):
+    "The ARFF header declaring the (name, categories) attributes of schema"
+    lines = ['@relation ' + relation, '']
+    for name, categories in schema:
+        kind = 'numeric' if categories is None else '{' + ','.join(categories) + '}'
+        lines.append('@attribute %s %s' % (name, kind))
+    lines.extend(['', '@data', ''])
+    return '\n'.join(lines)
+
+class FeatureExtractor:
+    """
+    Fills one typed array with the attributes of a game state.
+
+    The array (values) is allocated once and overwritten by every call to
+    extract; copy it to keep the values of a move.
+    """
+
+    def __init__( self, numGhosts=4 ):
+        self.numGhosts = numGhosts
+        self.schema = getSchema(numGhosts)
+        self.names = [name for name, categories in self.schema]
+        self.columns = dict([(name, i) for i, name in enumerate(self.names)])
+        self.codes = [categories and dict([(value, code) for code, value in enumerate(categories)])
+                      for name, categories in self.schema]
+        self.values = numpy.zeros(len(self.schema), dtype=numpy.float64)
+
+        # Where each group of attributes starts
+        self.legalColumn = self.columns['legal_1']
+        self.livingColumn = self.columns['p_living']
+        self.positionColumn = self.columns['g1_x'] if numGhosts else self.columns['n_food']
+        self.directionColumn = self.positionColumn + 2 * numGhosts
+        self.distanceColumn = self.directionColumn + numGhosts
+        self.wallColumn = self.columns['north_wall']
+
+    def extract( self, gameState, action=None ):
+        "Writes the attributes of gameState (and the action taken in it) into values"
+        values = self.values
+        numGhosts = self.numGhosts
+        board = gameState.data.layout
+        x, y = gameState.getPacmanPosition()
+        values[0:4] = board.width, board.height, x, y
+
+        legal = gameState.getLegalPacmanActions()
+        column = self.legalColumn
+        for i, legalAction in enumerate(LEGAL_ORDER):
+            values[column + i] = legalAction in legal
+        values[column + 5] = self.code(column + 5, gameState.data.agentStates[0].getDirection())
+        values[column + 6] = numGhosts
+
+        column = self.livingColumn
+        values[column:column + numGhosts + 1] = gameState.getLivingGhosts()[:numGhosts + 1]
+        column = self.positionColumn
+        values[column:column + 2 * numGhosts] = [i for position in gameState.getGhostPositions()[:numGhosts] for i in position]
+        column = self.directionColumn
+        directions = gameState.getGhostDirections()
+        for i in range(numGhosts):
+            values[column + i] = self.code(column + i, str(directions.get(i)))
+        column = self.distanceColumn
+        distances = gameState.data.ghostDistances[:numGhosts]
+        values[column:column + numGhosts] = [d if d is not None else 0 for d in distances]
+
+        numFood = gameState.getNumFood()
+        values[column + numGhosts] = numFood
+        values[column + numGhosts + 1] = gameState.getDistanceNearestFood() if numFood > 0 else NO_FOOD_DISTANCE
+
+        column = self.wallColumn
+        mask = board.getWallMasks()[(x, y)]
+        for i, (name, bit) in enumerate(WALLS):
+            values[column + i] = mask & bit != 0
+        noisy = [d for d in distances if d is not None]
+        values[column + 4] = min(noisy) if noisy else 0
+        values[column + 5] = self.code(column + 5, action)
+        values[column + 6] = gameState.getScore()
+        return values
+
+    def code( self, column, value ):
+        "The code of a nominal value, -1 if it is not among the categories"
+        return self.codes[column].get(value, -1)
+
+    def decode( self, columns=None ):
+        """
+        The values of columns (all by default) as Python values: ints (or
+        floats) for numeric attributes and the category, or MISSING, for
+        nominal ones.
+        """
+        if columns is None: columns = range(len(self.schema))
+        return [decodeValue(self.schema[column][1], self.values[column]) for column in columns]
+
+    def format( self, columns=None ):
+        "The values of columns (all by default) as the strings written to the datasets"
+        return [str(value) for value in self.decode(columns)]
+
+    def arffLine( self, columns=None ):
+        return ','.join(self.format(columns)) + '\n'
+
+    def arffHeader( self, relation, columns=None ):
+        "The ARFF header declaring the attributes of columns (all by default)"
+        if columns is None: columns = range(len(self.schema))
+        return arffHeader(relation, [self.schema[column] for column in columns])
+
+    def getColumns( self, names ):
+        "The columns of the attributes in names"
+        return [self.columns[name] for name in names]
@@ -273,11 +273,155 @@ class Grid:
                 bools.append(False)
         return bools
 
+class BitGrid:
+    """
+    A 2-dimensional array of booleans packed into a single integer.  It is
+    accessed via grid[x][y] like a Grid; the cell (x,y) is bit x*height+y,
+    the same order in which Grid.packBits and Grid.__hash__ walk the cells.
+
+    Since the integer is immutable, copies share it and cost O(1) whatever the
+    size of the board, and count, hashing and equality are single integer
+    operations.  Layouts use it for food.
+    """
+    def __init__(self, width, height, initialValue=False, bitRepresentation=None):
+        if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
+        self.CELLS_PER_INT = 30
+
+        self.width = width
+        self.height = height
+        self.mask = (1 << (width * height)) - 1
+        if initialValue: self.bits = self.mask
+        else: self.bits = 0
+        if bitRepresentation:
+            self._unpackBits(bitRepresentation)
+
+    def __getitem__(self, x):
+        if x < 0: x += self.width
+        if not 0 <= x < self.width: raise IndexError('grid index out of range')
+        return BitGridColumn(self, x)
+
+    def __setitem__(self, x, column):
+        for y, item in enumerate(column):
+            self.set(x, y, item)
+
+    def __iter__(self):
+        for x in range(self.width):
+            yield BitGridColumn(self, x)
+
+    def __len__(self):
+        return self.width
+
+    def get(self, x, y):
+        return (self.bits >> (x * self.height + y)) & 1 == 1
+
+    def set(self, x, y, item):
+        bit = 1 << (x * self.height + y)
+        if item: self.bits |= bit
+        else: self.bits &= ~bit
+
+    def __str__(self):
+        out = [[str(self.get(x, y))[0] for x in range(self.width)] for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other):
+        if other == None: return False
+        return self.bits == other.bits and self.height == other.height
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        # Same value as Grid.__hash__ on the same cells
+        return hash(self.bits)
+
+    def copy(self):
+        g = BitGrid(self.width, self.height)
+        g.bits = self.bits
+        return g
+
+    def deepCopy(self):
+        return self.copy()
+
+    def shallowCopy(self):
+        return self.copy()
+
+    def count(self, item =True ):
+        trues = bin(self.bits).count('1')
+        if item: return trues
+        return self.width * self.height - trues
+
+    def asList(self, key = True):
+        bits = self.bits
+        if not key: bits = ~bits & self.mask
+        list = []
+        while bits:
+            lowest = bits & -bits
+            index = lowest.bit_length() - 1
+            list.append( (index / self.height, index % self.height) )
+            bits ^= lowest
+        return list
+
+    def packBits(self):
+        """
+        Returns the same (width, height, bitPackedInts...) tuple as
+        Grid.packBits, converting whole chunks of cells at a time.
+        """
+        cells = self.width * self.height
+        # One character per cell, cell 0 first
+        text = bin(self.bits)[2:].zfill(cells)[::-1]
+        bits = [self.width, self.height]
+        for start in range(0, cells, self.CELLS_PER_INT):
+            bits.append(int(text[start:start + self.CELLS_PER_INT].ljust(self.CELLS_PER_INT, '0'), 2))
+        if cells % self.CELLS_PER_INT == 0:
+            bits.append(0)
+        return tuple(bits)
+
+    def _unpackBits(self, bits):
+        """
+        Fills in data from a representation made by packBits
+        """
+        for packed in bits:
+            if packed < 0: raise ValueError, "must be a positive integer"
+        text = ''.join([bin(packed)[2:].zfill(self.CELLS_PER_INT) for packed in bits])
+        text = text[:self.width * self.height]
+        if text: self.bits = int(text[::-1], 2)
+
+class BitGridColumn:
+    """
+    The column grid[x] of a BitGrid, so that grid[x][y] reads and writes
+    the bit of (x,y).
+    """
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+
+    def __getitem__(self, y):
+        if y < 0: y += self.grid.height
+        if not 0 <= y < self.grid.height: raise IndexError('grid index out of range')
+        return self.grid.get(self.x, y)
+
+    def __setitem__(self, y, item):
+        if y < 0: y += self.grid.height
+        if not 0 <= y < self.grid.height: raise IndexError('grid index out of range')
+        self.grid.set(self.x, y, item)
+
+    def __iter__(self):
+        column = self.grid.bits >> (self.x * self.grid.height)
+        for y in range(self.grid.height):
+            yield (column >> y) & 1 == 1
+
+    def __len__(self):
+        return self.grid.height
+
+    def count(self, item = True):
+        return list(self).count(item)
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
         return bitRep
     width, height = bitRep[:2]
-    return Grid(width, height, bitRepresentation= bitRep[2:])
+    return BitGrid(width, height, bitRepresentation= bitRep[2:])
 
 ####################################
 # Parts you shouldn't have to read #
@@ -328,7 +472,17 @@ class Actions:
         return (dx * speed, dy * speed)
     directionToVector = staticmethod(directionToVector)
 
-    def getPossibleActions(config, walls):
+    def getPossibleActions(config, walls, legalActions = None):
+        """
+        Returns a new list of the directions an agent with configuration config
+        may take.  legalActions, a Layout.getLegalActions table, answers for
+        agents standing exactly on a grid point; other positions are worked
+        out from the walls.
+        """
+        if legalActions is not None:
+            possible = legalActions.get(config.pos)
+            if possible is not None: return list(possible)
+
         possible = []
         x, y = config.pos
         x_int, y_int = int(x + 0.5), int(y + 0.5)
@@ -347,6 +501,14 @@ class Actions:
 
     getPossibleActions = staticmethod(getPossibleActions)
 
+    def isPossibleAction(config, walls, action, legalActionSets = None):
+        "Whether getPossibleActions would allow action, with a set lookup when possible"
+        if legalActionSets is not None:
+            possible = legalActionSets.get(config.pos)
+            if possible is not None: return action in possible
+        return action in Actions.getPossibleActions(config, walls)
+    isPossibleAction = staticmethod(isPossibleAction)
+
     def getLegalNeighbors(position, walls):
         x,y = position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
@@ -391,10 +553,32 @@ class GameStateData:
         self._win = False
         self.scoreChange = 0
 
+    def copyOnWrite( self ):
+        """
+        Returns a successor data packet that shares the food grid, capsules
+        and agent states with this one.  Whoever changes the successor must
+        replace what it changes (see copyAgentState) rather than mutate the
+        shared objects.
+        """
+        state = GameStateData()
+        state.food = self.food
+        state.capsules = self.capsules
+        state.agentStates = self.agentStates[:]
+        state.layout = self.layout
+        state._eaten = self._eaten
+        state.score = self.score
+        return state
+
+    def copyAgentState( self, index ):
+        "Gives this packet its own copy of an agent state, ready to be changed"
+        agentState = self.agentStates[index].copy()
+        self.agentStates[index] = agentState
+        return agentState
+
     def deepCopy( self ):
         state = GameStateData( self )
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        # Layouts are never modified after parsing, so copies share them
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -727,3 +911,51 @@ class Game:
                     self.unmute()
                     return
         self.display.finish()
+
+class FastGame(Game):
+    """
+    A Game with the run loop cut down to what training needs.
+
+    Agents are called directly, in a fixed order, with no display, muting,
+    timing or exception handling, and the move history is only kept when
+    asked for.  Agents with an observationFunction get it applied to a copy
+    of the state, as in Game.run; other agents (e.g. the ghosts in
+    ghostAgents.py) receive the game state itself, which they must not
+    modify.  Under a fixed seed the games played are the same as with Game.
+    """
+
+    def __init__( self, agents, rules, startingIndex=0, keepHistory=False ):
+        Game.__init__( self, agents, None, rules, startingIndex )
+        self.keepHistory = keepHistory
+
+    def run( self ):
+        """
+        Main control loop for game play.
+        """
+        for i, agent in enumerate(self.agents):
+            if not agent:
+                raise Exception("Agent %d failed to load" % i)
+            if hasattr(agent, 'registerInitialState'):
+                agent.registerInitialState(self.state.deepCopy())
+
+        observers = [getattr(agent, 'observationFunction', None) for agent in self.agents]
+        actors = [agent.getAction for agent in self.agents]
+        numAgents = len( self.agents )
+        agentIndex = self.startingIndex
+        while not self.gameOver:
+            observe = observers[agentIndex]
+            if observe is None:
+                observation = self.state
+            else:
+                observation = observe(self.state.deepCopy())
+            action = actors[agentIndex](observation)
+
+            if self.keepHistory:
+                self.moveHistory.append( (agentIndex, action) )
+            self.state = self.state.generateSuccessor( agentIndex, action )
+            self.rules.process(self.state, self)
+            agentIndex = ( agentIndex + 1 ) % numAgents
+
+        for agent in self.agents:
+            if hasattr(agent, 'final'):
+                agent.final( self.state )
@@ -21,6 +21,7 @@
 
 from util import *
 import time, os
+import datasets, episodes
 import traceback
 import sys
 
@@ -524,6 +525,7 @@ class Game:
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
         self.moveHistory = []
+        self.store = None
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
@@ -607,20 +609,47 @@ class Game:
                 ## TODO: could this exceed the total time
                 self.unmute()
 
+        #cada tick de pacman se guarda tal cual; al acabar la partida se
+        #escribe cada tick con todos sus atributos menos el ultimo + el ultimo
+        #atributo (la puntuacion) del tick siguiente, tambien si la partida
+        #acaba por el fallo de un agente
+        f = datasets.DatasetWriter('../p1/training/training_bot.arff')
+        try:
+            self._play()
+        finally:
+            store = self.store
+            if store is not None:
+                last = store.names[-1]
+                for row in store.table(store.names[:-1], [(last, 1)]):
+                    f.write(map(str, row))
+            f.close()
+        if self.agentCrashed: return
+
+        # inform a learning agent of the game result
+        for agentIndex, agent in enumerate(self.agents):
+            if "final" in dir( agent ) :
+                try:
+                    self.mute(agentIndex)
+                    agent.final( self.state )
+                    self.unmute()
+                except Exception,data:
+                    if not self.catchExceptions: raise
+                    self._agentCrash(agentIndex)
+                    self.unmute()
+                    return
+        self.display.finish()
+        print ''.join(self.agents[0].printLineData()[len(self.agents[0].printLineData())-1:len(self.agents[0].printLineData())])
+
+    def _play( self ):
+        """
+        Plays the moves until the game is over (or an agent crashes),
+        recording every tick of pacman in the EpisodeStore self.store (left
+        None if pacman has no attributes to record).
+        """
         agentIndex = self.startingIndex
         numAgents = len( self.agents )
         step = 0
 
-
-        #time_travel[0] es pasado
-        #time_travel[1] es presente
-        #en cada tick imprimiremos time_travel[0][todos menos el ultimo] + time_travel[1][ultimo atributo]
-        time_travel = [[] for _ in range(2)]
-        d_size=len(self.agents[0].printLineData())
-        line=[]
-
-        f=open('../p1/training/training_bot.arff','a+')
-
         while not self.gameOver:
             # Fetch the next agent
             agent = self.agents[agentIndex]
@@ -629,15 +658,9 @@ class Game:
             d_size=len(self.agents[0].printLineData())
 
             if agentIndex==0 and d_size>0:
-
-                time_travel[step%2] = self.agents[0].printLineData()
-                if step>2:
-                    line.extend((map(str,time_travel[(step+ 1)%2][:d_size-1])))
-                line.append(time_travel[step%2][d_size-1])
-
-                f.write(','.join(line))
-                f.write('\n')
-                line=[]
+                if self.store is None:
+                    self.store = episodes.EpisodeStore(range(d_size), dtype=object)
+                self.store.record(self.agents[0].printLineData())
 
             #As reminder, uncomment to check the time delay between score and the attributes
             '''
@@ -750,20 +773,3 @@ class Game:
 
             if _BOINC_ENABLED:
                 boinc.set_fraction_done(self.getProgress())
-
-        f.close()
-
-        # inform a learning agent of the game result
-        for agentIndex, agent in enumerate(self.agents):
-            if "final" in dir( agent ) :
-                try:
-                    self.mute(agentIndex)
-                    agent.final( self.state )
-                    self.unmute()
-                except Exception,data:
-                    if not self.catchExceptions: raise
-                    self._agentCrash(agentIndex)
-                    self.unmute()
-                    return
-        self.display.finish()
-        print ''.join(self.agents[0].printLineData()[len(self.agents[0].printLineData())-1:len(self.agents[0].printLineData())])
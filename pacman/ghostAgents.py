@@ -36,8 +36,21 @@ class GhostAgent( Agent ):
 
 class RandomGhost( GhostAgent ):
     "A ghost that chooses a legal action uniformly at random."
+
+    # Prepared distributions by tuple of legal actions, shared by all random
+    # ghosts since the distribution depends on nothing else
+    samplers = {}
+
+    def getAction( self, state ):
+        legal = tuple(state.getLegalActions( self.index ))
+        if len(legal) == 0:
+            return Directions.STOP
+        if legal not in RandomGhost.samplers:
+            RandomGhost.samplers[legal] = util.Sampler(self.getDistribution(state))
+        return RandomGhost.samplers[legal].sample()
+
     def getDistribution( self, state ):
-        dist = util.Counter()
+        dist = util.LeanCounter()
         for a in state.getLegalActions( self.index ): dist[a] = 1.0
         dist.normalize()
         return dist
@@ -82,7 +95,7 @@ class DirectionalGhost( GhostAgent ):
         bestActions = [action for action, distance in zip( legalActions, distancesToPacman ) if distance == bestScore]
 
         # Construct distribution
-        dist = util.Counter()
+        dist = util.LeanCounter()
         for a in bestActions: dist[a] = bestProb / len(bestActions)
         for a in legalActions: dist[a] += ( 1-bestProb ) / len(legalActions)
         dist.normalize()
@@ -13,10 +13,13 @@
 
 
 import itertools
+import numpy
 import util
 import random
 import busters
 import game
+import ghostAgents
+import bustersGhostAgents
 
 class InferenceModule:
     """
@@ -47,7 +50,7 @@ class InferenceModule:
         """
         ghostPosition = gameState.getGhostPosition(self.index) # The position you set
         actionDist = self.ghostAgent.getDistribution(gameState)
-        dist = util.Counter()
+        dist = util.LeanCounter()
         for action, prob in actionDist.items():
             successorPosition = game.Actions.getSuccessor(ghostPosition, action)
             dist[successorPosition] = prob
@@ -71,6 +74,57 @@ class InferenceModule:
         gameState.data.agentStates[self.index] = game.AgentState(conf, False)
         return gameState
 
+    def initializeCells(self):
+        """
+        Indexes self.legalPositions plus the jail cell (self.cells), for the
+        modules that keep their beliefs in NumPy arrays over cells.
+        """
+        self.cells = self.legalPositions + [self.getJailPosition()]
+        self.cellIndex = dict([(p, i) for i, p in enumerate(self.cells)])
+        self.jailIndex = len(self.cells) - 1
+        self.cellX = numpy.array([x for x, y in self.cells])
+        self.cellY = numpy.array([y for x, y in self.cells])
+        # Per Pacman position: Manhattan distances of the cells and the
+        # (sources, targets, probabilities) of the ghost's transitions
+        self.distances = {}
+        self.transitions = {}
+
+    def getDistances(self, pacmanPosition):
+        "Manhattan distances from Pacman to every cell"
+        if pacmanPosition not in self.distances:
+            px, py = pacmanPosition
+            self.distances[pacmanPosition] = numpy.abs(self.cellX - px) + numpy.abs(self.cellY - py)
+        return self.distances[pacmanPosition]
+
+    def getTransitions(self, gameState):
+        """
+        Returns the ghost's transition model from gameState as parallel arrays
+        of source cells, target cells and probabilities.
+
+        The model may depend on Pacman's position (e.g., for DirectionalGhost),
+        so it is built once per Pacman position, from
+        self.getPositionDistribution(self.setGhostPosition(gameState, oldPos))
+        for every cell oldPos.  Ghosts that may also depend on the other
+        ghosts (see ignoresOtherGhosts) get it built anew every time.
+        """
+        pacmanPosition = gameState.getPacmanPosition()
+        if pacmanPosition not in self.transitions or not ignoresOtherGhosts(self.ghostAgent):
+            ghostState = gameState.data.agentStates[self.index]
+            sources, targets, probs = [], [], []
+            for source, oldPos in enumerate(self.cells):
+                newPosDist = self.getPositionDistribution(self.setGhostPosition(gameState, oldPos))
+                for newPos, prob in newPosDist.items():
+                    target = self.cellIndex.get(newPos)
+                    if target != None and prob > 0:
+                        sources.append(source)
+                        targets.append(target)
+                        probs.append(prob)
+            gameState.data.agentStates[self.index] = ghostState
+            self.transitions[pacmanPosition] = (numpy.array(sources, dtype=int),
+                                                numpy.array(targets, dtype=int),
+                                                numpy.array(probs))
+        return self.transitions[pacmanPosition]
+
     def observeState(self, gameState):
         "Collects the relevant noisy distance observation and pass it along."
         distances = gameState.getNoisyGhostDistances()
@@ -112,133 +166,77 @@ class ExactInference(InferenceModule):
     """
     The exact dynamic inference module should use forward-algorithm updates to
     compute the exact belief function at each time step.
+
+    Beliefs are a dense NumPy vector over self.cells, the legal positions plus
+    the jail cell, so that each observation is a product with the emission
+    probabilities of the cells' distances to Pacman, and each time step is a
+    sparse product with the ghost's transition model.
     """
 
     def initializeUniformly(self, gameState):
         "Begin with a uniform distribution over ghost positions."
-        self.beliefs = util.Counter()
-        for p in self.legalPositions: self.beliefs[p] = 1.0
-        self.beliefs.normalize()
+        self.initializeCells()
+        self.beliefs = numpy.zeros(len(self.cells))
+        self.beliefs[:self.jailIndex] = 1.0 / max(1, self.jailIndex)
 
     def observe(self, observation, gameState):
         """
         Updates beliefs based on the distance observation and Pacman's position.
 
         The noisyDistance is the estimated Manhattan distance to the ghost you
-        are tracking.
-
-        The emissionModel below stores the probability of the noisyDistance for
-        any true distance you supply. That is, it stores P(noisyDistance |
-        TrueDistance).
-
-        self.legalPositions is a list of the possible ghost positions (you
-        should only consider positions that are in self.legalPositions).
-
-        A correct implementation will handle the following special case:
-          *  When a ghost is captured by Pacman, all beliefs should be updated
-             so that the ghost appears in its prison cell, position
-             self.getJailPosition()
+        are tracking; the beliefs are multiplied by P(noisyDistance |
+        TrueDistance) for each cell and normalized.
 
-             You can check if a ghost has been captured by Pacman by
-             checking if it has a noisyDistance of None (a noisy distance
-             of None will be returned if, and only if, the ghost is
-             captured).
+        When a ghost is captured by Pacman its noisyDistance is None, and all
+        beliefs are moved to its prison cell, position self.getJailPosition().
+        If the observation rules out every believed cell, the beliefs start
+        over from the observation alone.
         """
         noisyDistance = observation
-        emissionModel = busters.getObservationDistribution(noisyDistance)
-        pacmanPosition = gameState.getPacmanPosition()
-       
-        "*** YOUR CODE HERE ***"
-        ##AA
-        '''print("Estamos Aqui")
-        print(pacmanPosition)
-        print(noisyDistance)
-        print(emissionModel)
-        print("Estamos Aqui")
-        ##move = Directions.WEST
-        #AA'''
-        ##util.raiseNotDefined()
-
-        # Replace this code with a correct observation update
-        # Be sure to handle the "jail" edge case where the ghost is eaten
-        # and noisyDistance is None
-        allPossible = util.Counter()
-        for p in self.legalPositions:
-            trueDistance = util.manhattanDistance(p, pacmanPosition)
-            if emissionModel[trueDistance] > 0:
-                allPossible[p] = 1.0
-
-        "*** END YOUR CODE HERE ***"
-
-        allPossible.normalize()
-        self.beliefs = allPossible
+        beliefs = numpy.zeros(len(self.cells))
+        if noisyDistance == None:
+            beliefs[self.jailIndex] = 1.0
+            self.beliefs = beliefs
+            return
+
+        likelihood = getEmissions(noisyDistance, self.getDistances(gameState.getPacmanPosition()))
+        likelihood[self.jailIndex] = 0.0
+        beliefs = self.beliefs * likelihood
+        if beliefs.sum() == 0:
+            beliefs = likelihood
+        total = beliefs.sum()
+        if total > 0:
+            self.beliefs = beliefs / total
 
     def elapseTime(self, gameState):
         """
         Update self.beliefs in response to a time step passing from the current
-        state.
-
-        The transition model is not entirely stationary: it may depend on
-        Pacman's current position (e.g., for DirectionalGhost).  However, this
-        is not a problem, as Pacman's current position is known.
-
-        In order to obtain the distribution over new positions for the ghost,
-        given its previous position (oldPos) as well as Pacman's current
-        position, use this line of code:
-
-          newPosDist = self.getPositionDistribution(self.setGhostPosition(gameState, oldPos))
-
-        Note that you may need to replace "oldPos" with the correct name of the
-        variable that you have used to refer to the previous ghost position for
-        which you are computing this distribution. You will need to compute
-        multiple position distributions for a single update.
-
-        newPosDist is a util.Counter object, where for each position p in
-        self.legalPositions,
-
-        newPostDist[p] = Pr( ghost is at position p at time t + 1 | ghost is at position oldPos at time t )
-
-        (and also given Pacman's current position).  You may also find it useful
-        to loop over key, value pairs in newPosDist, like:
-
-          for newPos, prob in newPosDist.items():
-            ...
+        state:
 
-        *** GORY DETAIL AHEAD ***
-
-        As an implementation detail (with which you need not concern yourself),
-        the line of code at the top of this comment block for obtaining
-        newPosDist makes use of two helper methods provided in InferenceModule
-        above:
-
-          1) self.setGhostPosition(gameState, ghostPosition)
-              This method alters the gameState by placing the ghost we're
-              tracking in a particular position.  This altered gameState can be
-              used to query what the ghost would do in this position.
-
-          2) self.getPositionDistribution(gameState)
-              This method uses the ghost agent to determine what positions the
-              ghost will move to from the provided gameState.  The ghost must be
-              placed in the gameState with a call to self.setGhostPosition
-              above.
-
-        It is worthwhile, however, to understand why these two helper methods
-        are used and how they combine to give us a belief distribution over new
-        positions after a time update from a particular position.
+          beliefs'[newPos] = sum over oldPos of P(newPos | oldPos) * beliefs[oldPos]
         """
-        "*** YOUR CODE HERE ***"
-        ##util.raiseNotDefined()
+        sources, targets, probs = self.getTransitions(gameState)
+        beliefs = numpy.bincount(targets, weights=self.beliefs[sources] * probs, minlength=len(self.cells))
+        total = beliefs.sum()
+        if total > 0:
+            self.beliefs = beliefs / total
 
     def getBeliefDistribution(self):
-        return self.beliefs
+        "The beliefs as a Counter over the cells the ghost may be in"
+        beliefs = util.LeanCounter()
+        for i in numpy.flatnonzero(self.beliefs):
+            beliefs[self.cells[i]] = float(self.beliefs[i])
+        return beliefs
 
 class ParticleFilter(InferenceModule):
     """
     A particle filter for approximately tracking a single ghost.
 
-    Useful helper functions will include random.choice, which chooses an element
-    from a list uniformly at random, and util.sample, which samples a key from a
-    Counter by treating its values as probabilities.
+    Particles are stored as a NumPy array of indices into self.cells (the
+    legal positions plus the jail cell), so weighting, resampling and moving
+    them are vector operations whatever the number of particles.  Random
+    draws come from a NumPy generator seeded from the random module, so
+    fixed-seed games (-f) stay reproducible.
     """
 
     def __init__(self, ghostAgent, numParticles=300):
@@ -248,80 +246,67 @@ class ParticleFilter(InferenceModule):
     def setNumParticles(self, numParticles):
         self.numParticles = numParticles
 
+    def initialize(self, gameState):
+        """
+        Seeds the NumPy generator once per game, so that the resets of
+        observe do not draw from the random module mid-game.
+        """
+        self.random = numpy.random.RandomState(random.randint(0, 2 ** 31 - 1))
+        InferenceModule.initialize(self, gameState)
 
     def initializeUniformly(self, gameState):
         """
-        Initializes a list of particles. Use self.numParticles for the number of
-        particles. Use self.legalPositions for the legal board positions where a
-        particle could be located.  Particles should be evenly (not randomly)
-        distributed across positions in order to ensure a uniform prior.
-
-        Note: the variable you store your particles in must be a list; a list is
-        simply a collection of unweighted variables (positions in this case).
-        Storing your particles as a Counter (where there could be an associated
-        weight with each position) is incorrect and may produce errors.
+        Spreads self.numParticles particles evenly (not randomly) across
+        self.legalPositions, to ensure a uniform prior.
         """
-        "*** YOUR CODE HERE ***"
+        self.initializeCells()
+        self.tables = {}
+        self.particles = numpy.arange(self.numParticles) % self.jailIndex
 
     def observe(self, observation, gameState):
         """
-        Update beliefs based on the given distance observation. Make sure to
-        handle the special case where all particles have weight 0 after
-        reweighting based on observation. If this happens, resample particles
-        uniformly at random from the set of legal positions
-        (self.legalPositions).
-
-        A correct implementation will handle two special cases:
-          1) When a ghost is captured by Pacman, all particles should be updated
-             so that the ghost appears in its prison cell,
-             self.getJailPosition()
-
-             As before, you can check if a ghost has been captured by Pacman by
-             checking if it has a noisyDistance of None.
-
-          2) When all particles receive 0 weight, they should be recreated from
-             the prior distribution by calling initializeUniformly. The total
-             weight for a belief distribution can be found by calling totalCount
-             on a Counter object
-
-        util.sample(Counter object) is a helper method to generate a sample from
-        a belief distribution.
+        Update beliefs based on the given distance observation, by
+        resampling the particles in proportion to P(noisyDistance |
+        TrueDistance).
 
-        You may also want to use util.manhattanDistance to calculate the
-        distance between a particle and Pacman's position.
+        When a ghost is captured by Pacman (its noisyDistance is None), all
+        particles are moved to its prison cell, self.getJailPosition().  When
+        all particles receive 0 weight, they are spread evenly over the legal
+        positions again, as by initializeUniformly (but keeping its caches).
         """
         noisyDistance = observation
-        emissionModel = busters.getObservationDistribution(noisyDistance)
-        pacmanPosition = gameState.getPacmanPosition()
-        "*** YOUR CODE HERE ***"
-        ##util.raiseNotDefined()
+        if noisyDistance == None:
+            self.particles[:] = self.jailIndex
+            return
+
+        likelihood = getEmissions(noisyDistance, self.getDistances(gameState.getPacmanPosition()))
+        likelihood[self.jailIndex] = 0.0
+        weights = likelihood[self.particles]
+        if weights.sum() == 0:
+            self.particles = numpy.arange(self.numParticles) % self.jailIndex
+        else:
+            self.particles = self.particles[resample(weights, self.random)]
 
     def elapseTime(self, gameState):
         """
-        Update beliefs for a time step elapsing.
-
-        As in the elapseTime method of ExactInference, you should use:
-
-          newPosDist = self.getPositionDistribution(self.setGhostPosition(gameState, oldPos))
-
-        to obtain the distribution over new positions for the ghost, given its
-        previous position (oldPos) as well as Pacman's current position.
-
-        util.sample(Counter object) is a helper method to generate a sample from
-        a belief distribution.
+        Moves every particle to a position drawn from the ghost's transition
+        model (see getTransitions) for its current position.
         """
-        "*** YOUR CODE HERE ***"
-        ##util.raiseNotDefined()
+        pacmanPosition = gameState.getPacmanPosition()
+        if pacmanPosition not in self.tables or not ignoresOtherGhosts(self.ghostAgent):
+            sources, targets, probs = self.getTransitions(gameState)
+            self.tables[pacmanPosition] = transitionTable(sources, targets, probs, len(self.cells))
+        self.particles = sampleTransitions(self.particles, self.tables[pacmanPosition], self.random)
 
     def getBeliefDistribution(self):
         """
-        Return the agent's current belief state, a distribution over ghost
-        locations conditioned on all evidence and time passage. This method
-        essentially converts a list of particles into a belief distribution (a
-        Counter object)
+        Returns the fraction of particles in each position as a Counter.
         """
-        "*** YOUR CODE HERE ***"
-       ## util.raiseNotDefined()
+        counts = numpy.bincount(self.particles, minlength=len(self.cells))
+        beliefs = util.LeanCounter()
+        for i in numpy.flatnonzero(counts):
+            beliefs[self.cells[i]] = counts[i] / float(len(self.particles))
+        return beliefs
 
 class MarginalInference(InferenceModule):
     """
@@ -348,7 +333,7 @@ class MarginalInference(InferenceModule):
     def getBeliefDistribution(self):
         "Returns the marginal belief over a particular ghost by summing out the others."
         jointDistribution = jointInference.getBeliefDistribution()
-        dist = util.Counter()
+        dist = util.LeanCounter()
         for t, prob in jointDistribution.items():
             dist[t[self.index - 1]] += prob
         return dist
@@ -357,6 +342,10 @@ class JointParticleFilter:
     """
     JointParticleFilter tracks a joint distribution over tuples of all ghost
     positions.
+
+    Particles are the rows of a (numParticles x numGhosts) NumPy array of
+    indices into self.cells, the legal positions followed by the jail cell of
+    every ghost.
     """
 
     def __init__(self, numParticles=600):
@@ -370,30 +359,22 @@ class JointParticleFilter:
         self.numGhosts = gameState.getNumAgents() - 1
         self.ghostAgents = []
         self.legalPositions = legalPositions
+        self.cells = legalPositions + [self.getJailPosition(i) for i in range(self.numGhosts)]
+        self.cellIndex = dict([(p, c) for c, p in enumerate(self.cells)])
+        self.cellX = numpy.array([x for x, y in self.cells])
+        self.cellY = numpy.array([y for x, y in self.cells])
+        self.distances = {}
+        self.tables = {}
+        self.random = numpy.random.RandomState(random.randint(0, 2 ** 31 - 1))
         self.initializeParticles()
 
     def initializeParticles(self):
         """
-        Initialize particles to be consistent with a uniform prior.
-
-        Each particle is a tuple of ghost positions. Use self.numParticles for
-        the number of particles. You may find the `itertools` package helpful.
-        Specifically, you will need to think about permutations of legal ghost
-        positions, with the additional understanding that ghosts may occupy the
-        same space. Look at the `itertools.product` function to get an
-        implementation of the Cartesian product.
-
-        Note: If you use itertools, keep in mind that permutations are not
-        returned in a random order; you must shuffle the list of permutations in
-        order to ensure even placement of particles across the board. Use
-        self.legalPositions to obtain a list of positions a ghost may occupy.
-
-        Note: the variable you store your particles in must be a list; a list is
-        simply a collection of unweighted variables (positions in this case).
-        Storing your particles as a Counter (where there could be an associated
-        weight with each position) is incorrect and may produce errors.
+        Initialize particles to be consistent with a uniform prior over the
+        Cartesian product of legal positions (ghosts may occupy the same
+        space): each ghost's position is drawn independently and uniformly.
         """
-        "*** YOUR CODE HERE ***"
+        self.particles = self.random.randint(0, len(self.legalPositions), size=(self.numParticles, self.numGhosts))
 
     def addGhostAgent(self, agent):
         """
@@ -405,42 +386,44 @@ class JointParticleFilter:
     def getJailPosition(self, i):
         return (2 * i + 1, 1);
 
+    def getJailIndex(self, i):
+        return len(self.legalPositions) + i
+
     def observeState(self, gameState):
         """
         Resamples the set of particles using the likelihood of the noisy
         observations.
 
-        To loop over the ghosts, use:
-
-          for i in range(self.numGhosts):
-            ...
-
-        A correct implementation will handle two special cases:
-          1) When a ghost is captured by Pacman, all particles should be updated
-             so that the ghost appears in its prison cell, position
-             self.getJailPosition(i) where `i` is the index of the ghost.
-
-             As before, you can check if a ghost has been captured by Pacman by
-             checking if it has a noisyDistance of None.
-
-          2) When all particles receive 0 weight, they should be recreated from
-             the prior distribution by calling initializeParticles. After all
-             particles are generated randomly, any ghosts that are eaten (have
-             noisyDistance of None) must be changed to the jail Position. This
-             will involve changing each particle if a ghost has been eaten.
-
-        self.getParticleWithGhostInJail is a helper method to edit a specific
-        particle. Since we store particles as tuples, they must be converted to
-        a list, edited, and then converted back to a tuple. This is a common
-        operation when placing a ghost in jail.
+        A ghost captured by Pacman (noisyDistance of None) is moved to its
+        prison cell, self.getJailPosition(i), in every particle.  When all
+        particles receive 0 weight, they are recreated from the prior by
+        calling initializeParticles, and captured ghosts are jailed again.
         """
         pacmanPosition = gameState.getPacmanPosition()
         noisyDistances = gameState.getNoisyGhostDistances()
         if len(noisyDistances) < self.numGhosts:
             return
-        emissionModels = [busters.getObservationDistribution(dist) for dist in noisyDistances]
-
-        "*** YOUR CODE HERE ***"
+        if pacmanPosition not in self.distances:
+            px, py = pacmanPosition
+            self.distances[pacmanPosition] = numpy.abs(self.cellX - px) + numpy.abs(self.cellY - py)
+        distances = self.distances[pacmanPosition]
+
+        weights = numpy.ones(len(self.particles))
+        for i in range(self.numGhosts):
+            if noisyDistances[i] == None:
+                self.particles[:, i] = self.getJailIndex(i)
+            else:
+                likelihood = getEmissions(noisyDistances[i], distances)
+                likelihood[len(self.legalPositions):] = 0.0
+                weights *= likelihood[self.particles[:, i]]
+
+        if weights.sum() == 0:
+            self.initializeParticles()
+            for i in range(self.numGhosts):
+                if noisyDistances[i] == None:
+                    self.particles[:, i] = self.getJailIndex(i)
+        else:
+            self.particles = self.particles[resample(weights, self.random)]
 
     def getParticleWithGhostInJail(self, particle, ghostIndex):
         """
@@ -451,64 +434,143 @@ class JointParticleFilter:
         particle[ghostIndex] = self.getJailPosition(ghostIndex)
         return tuple(particle)
 
-    def elapseTime(self, gameState):
+    def getTransitionTables(self, gameState):
         """
-        Samples each particle's next state based on its current state and the
-        gameState.
-
-        To loop over the ghosts, use:
-
-          for i in range(self.numGhosts):
-            ...
-
-        Then, assuming that `i` refers to the index of the ghost, to obtain the
-        distributions over new positions for that single ghost, given the list
-        (prevGhostPositions) of previous positions of ALL of the ghosts, use
-        this line of code:
-
-          newPosDist = getPositionDistributionForGhost(
-             setGhostPositions(gameState, prevGhostPositions), i, self.ghostAgents[i]
-          )
+        Returns, for every ghost, its transition table (see transitionTable)
+        from each cell given Pacman's position in gameState.
 
-        Note that you may need to replace `prevGhostPositions` with the correct
-        name of the variable that you have used to refer to the list of the
-        previous positions of all of the ghosts, and you may need to replace `i`
-        with the variable you have used to refer to the index of the ghost for
-        which you are computing the new position distribution.
-
-        As an implementation detail (with which you need not concern yourself),
-        the line of code above for obtaining newPosDist makes use of two helper
-        functions defined below in this file:
-
-          1) setGhostPositions(gameState, ghostPositions)
-              This method alters the gameState by placing the ghosts in the
-              supplied positions.
-
-          2) getPositionDistributionForGhost(gameState, ghostIndex, agent)
-              This method uses the supplied ghost agent to determine what
-              positions a ghost (ghostIndex) controlled by a particular agent
-              (ghostAgent) will move to in the supplied gameState.  All ghosts
-              must first be placed in the gameState using setGhostPositions
-              above.
-
-              The ghost agent you are meant to supply is
-              self.ghostAgents[ghostIndex-1], but in this project all ghost
-              agents are always the same.
+        For the ghosts whose move depends on their own position and Pacman's
+        only (see ignoresOtherGhosts) the tables are built once per Pacman
+        position rather than once per particle.  The other ghosts get None:
+        their moves are drawn per particle by sampleJointTransitions.
         """
-        newParticles = []
-        for oldParticle in self.particles:
-            newParticle = list(oldParticle) # A list of ghost positions
-            # now loop through and update each entry in newParticle...
-
-            "*** YOUR CODE HERE ***"
+        pacmanPosition = gameState.getPacmanPosition()
+        if pacmanPosition not in self.tables:
+            cellIndex = self.cellIndex
+            tables = []
+            for i in range(self.numGhosts):
+                if not ignoresOtherGhosts(self.ghostAgents[i]):
+                    tables.append(None)
+                    continue
+                ghostState = gameState.data.agentStates[i + 1]
+                sources, targets, probs = [], [], []
+                for source, oldPos in enumerate(self.cells):
+                    conf = game.Configuration(oldPos, game.Directions.STOP)
+                    gameState.data.agentStates[i + 1] = game.AgentState(conf, False)
+                    newPosDist = getPositionDistributionForGhost(gameState, i, self.ghostAgents[i])
+                    for newPos, prob in newPosDist.items():
+                        if newPos in cellIndex and prob > 0:
+                            sources.append(source)
+                            targets.append(cellIndex[newPos])
+                            probs.append(prob)
+                gameState.data.agentStates[i + 1] = ghostState
+                tables.append(transitionTable(sources, targets, probs, len(self.cells)))
+            self.tables[pacmanPosition] = tables
+        return self.tables[pacmanPosition]
 
-            "*** END YOUR CODE HERE ***"
-            newParticles.append(tuple(newParticle))
+    def elapseTime(self, gameState):
+        """
+        Samples each particle's next state based on its current state and the
+        gameState, one ghost (column of particles) at a time.
+        """
+        tables = self.getTransitionTables(gameState)
+        newParticles = self.particles.copy()
+        for i in range(self.numGhosts):
+            if tables[i] is None:
+                newParticles[:, i] = self.sampleJointTransitions(gameState, i)
+            else:
+                newParticles[:, i] = sampleTransitions(self.particles[:, i], tables[i], self.random)
         self.particles = newParticles
 
+    def sampleJointTransitions(self, gameState, i):
+        """
+        Draws ghost i's next cell for every particle when its move may depend
+        on the other ghosts (e.g., for DispersingGhost): its distribution is
+        computed with all the ghosts placed at the previous positions of each
+        distinct particle, as by setGhostPositions.
+        """
+        rows, inverse = numpy.unique(self.particles, axis=0, return_inverse=True)
+        ghostStates = gameState.data.agentStates[1:self.numGhosts + 1]
+        sources, targets, probs = [], [], []
+        for r, row in enumerate(rows):
+            setGhostPositions(gameState, [self.cells[c] for c in row])
+            newPosDist = getPositionDistributionForGhost(gameState, i, self.ghostAgents[i])
+            moves = [(self.cellIndex[newPos], prob) for newPos, prob in newPosDist.items()
+                     if newPos in self.cellIndex and prob > 0]
+            # Without moves the ghost stays where it is
+            for target, prob in moves or [(row[i], 1.0)]:
+                sources.append(r)
+                targets.append(target)
+                probs.append(prob)
+        gameState.data.agentStates[1:self.numGhosts + 1] = ghostStates
+        table = transitionTable(sources, targets, probs, len(rows))
+        return sampleTransitions(inverse, table, self.random)
+
     def getBeliefDistribution(self):
-        "*** YOUR CODE HERE ***"
-        util.raiseNotDefined()
+        "Returns the fraction of particles on each tuple of ghost positions."
+        rows, counts = numpy.unique(self.particles, axis=0, return_counts=True)
+        beliefs = util.LeanCounter()
+        for row, count in zip(rows, counts):
+            beliefs[tuple([self.cells[c] for c in row])] = count / float(len(self.particles))
+        return beliefs
+
+def getEmissions(noisyDistance, distances):
+    """
+    Returns P( noisyDistance | true distance ) for every entry of the array of
+    true distances.
+    """
+    emissionModel = busters.getObservationDistribution(noisyDistance)
+    emissions = numpy.zeros(distances.max() + 1)
+    for trueDistance, prob in emissionModel.items():
+        # Cells are at whole distances; noisy distances may be floats
+        if trueDistance == int(trueDistance) and 0 <= trueDistance < len(emissions):
+            emissions[int(trueDistance)] = prob
+    return emissions[distances]
+
+def resample(weights, generator):
+    """
+    Systematic resampling: returns len(weights) indices drawn in proportion
+    to weights, using a single uniform draw from the NumPy generator.
+    """
+    n = len(weights)
+    cdf = numpy.cumsum(weights)
+    points = (generator.random_sample() + numpy.arange(n)) * (cdf[-1] / n)
+    return numpy.minimum(numpy.searchsorted(cdf, points, side='right'), n - 1)
+
+def transitionTable(sources, targets, probs, numCells):
+    """
+    Packs a sparse transition model (parallel sequences of source cells,
+    target cells and probabilities) into two (numCells x maxMoves) arrays of
+    targets and cumulative probabilities, padded so that every row ends at
+    probability 1.  Cells without moves stay where they are.
+    """
+    moves = [[] for cell in range(numCells)]
+    for source, target, prob in zip(sources, targets, probs):
+        moves[source].append((target, prob))
+    width = max([len(m) for m in moves] + [1])
+    table = numpy.zeros((numCells, width), dtype=int)
+    cdf = numpy.ones((numCells, width))
+    for cell, cellMoves in enumerate(moves):
+        if not cellMoves: cellMoves = [(cell, 1.0)]
+        total = float(sum([prob for target, prob in cellMoves]))
+        cumulative = 0.0
+        for k, (target, prob) in enumerate(cellMoves):
+            cumulative += prob / total
+            table[cell, k] = target
+            cdf[cell, k] = cumulative
+        table[cell, len(cellMoves):] = cellMoves[-1][0]
+        cdf[cell, len(cellMoves) - 1:] = 1.0
+    return table, cdf
+
+def sampleTransitions(cells, table, generator):
+    """
+    Draws a successor for every cell in the array cells from a table built by
+    transitionTable.
+    """
+    targets, cdf = table
+    points = generator.random_sample(len(cells))
+    choices = (cdf[cells] <= points[:, None]).sum(axis=1)
+    return targets[cells, numpy.minimum(choices, targets.shape[1] - 1)]
 
 # One JointInference module is shared globally across instances of MarginalInference
 jointInference = JointParticleFilter()
@@ -521,12 +583,23 @@ def getPositionDistributionForGhost(gameState, ghostIndex, agent):
     # index 0 is pacman, but the students think that index 0 is the first ghost.
     ghostPosition = gameState.getGhostPosition(ghostIndex+1)
     actionDist = agent.getDistribution(gameState)
-    dist = util.Counter()
+    dist = util.LeanCounter()
     for action, prob in actionDist.items():
         successorPosition = game.Actions.getSuccessor(ghostPosition, action)
         dist[successorPosition] = prob
     return dist
 
+# Ghost agents whose moves depend on their own position and Pacman's only
+INDEPENDENT_GHOSTS = [ghostAgents.RandomGhost, ghostAgents.StaticGhost, ghostAgents.DirectionalGhost,
+                      bustersGhostAgents.StationaryGhost]
+
+def ignoresOtherGhosts(agent):
+    """
+    Whether agent is known to move regardless of where the other ghosts are,
+    so that its transition model can be shared by all the particles.
+    """
+    return agent.__class__ in INDEPENDENT_GHOSTS
+
 def setGhostPositions(gameState, ghostPositions):
     "Sets the position of all ghosts to the values in ghostPositionTuple."
     for index, pos in enumerate(ghostPositions):
@@ -13,11 +13,20 @@
 
 
 from util import manhattanDistance
-from game import Grid
+from game import Grid, BitGrid
+import copy
 import os
 import random
 
 VISIBILITY_MATRIX_CACHE = {}
+WALL_INDEX_CACHE = {}
+LEGAL_ACTIONS_CACHE = {}
+
+# Bits of the wall masks returned by Layout.getWallMasks
+WALL_NORTH = 1
+WALL_SOUTH = 2
+WALL_EAST = 4
+WALL_WEST = 8
 
 class Layout:
     """
@@ -28,13 +37,15 @@ class Layout:
         self.width = len(layoutText[0])
         self.height= len(layoutText)
         self.walls = Grid(self.width, self.height, False)
-        self.food = Grid(self.width, self.height, False)
+        self.food = BitGrid(self.width, self.height, False)
         self.capsules = []
         self.agentPositions = []
         self.numGhosts = 0
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
+        self.wallIndex = None
+        self.legalActions = None
         # self.initializeVisibilityMatrix()
 
     def getNumGhosts(self):
@@ -61,6 +72,82 @@ class Layout:
         else:
             self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
 
+    def getWallMasks(self):
+        """
+        Returns a dict mapping each legal (non wall) cell to a 4-bit mask of
+        the walls around it (WALL_NORTH | WALL_SOUTH | WALL_EAST | WALL_WEST).
+        Cells outside the board count as walls.
+        """
+        return self.getWallIndex()[0]
+
+    def getNeighbors(self):
+        """
+        Returns a dict mapping each legal cell to the tuple of legal cells
+        next to it, in north, south, east, west order.
+        """
+        return self.getWallIndex()[1]
+
+    def getWallIndex(self):
+        "Builds (or fetches from the cache) the wall masks and neighbor lists"
+        global WALL_INDEX_CACHE
+        if self.wallIndex is None:
+            key = "\n".join(self.layoutText)
+            if key not in WALL_INDEX_CACHE:
+                WALL_INDEX_CACHE[key] = self.computeWallIndex()
+            self.wallIndex = WALL_INDEX_CACHE[key]
+        return self.wallIndex
+
+    def computeWallIndex(self):
+        sides = [((0, 1), WALL_NORTH), ((0, -1), WALL_SOUTH), ((1, 0), WALL_EAST), ((-1, 0), WALL_WEST)]
+        masks = {}
+        neighbors = {}
+        for x, y in self.walls.asList(False):
+            mask = 0
+            cells = []
+            for (dx, dy), bit in sides:
+                nextx, nexty = x + dx, y + dy
+                if 0 <= nextx < self.width and 0 <= nexty < self.height and not self.walls[nextx][nexty]:
+                    cells.append((nextx, nexty))
+                else:
+                    mask |= bit
+            masks[(x, y)] = mask
+            neighbors[(x, y)] = tuple(cells)
+        return masks, neighbors
+
+    def getLegalActions(self):
+        """
+        Returns a dict from every non-wall position to the tuple of directions
+        Actions.getPossibleActions allows there, in the same order.
+        """
+        return self.getLegalActionTables()[0]
+
+    def getLegalActionSets(self):
+        "The same as getLegalActions, with frozensets for membership tests"
+        return self.getLegalActionTables()[1]
+
+    def getLegalActionTables(self):
+        "Builds (or fetches from the cache) the legal action tables"
+        global LEGAL_ACTIONS_CACHE
+        if self.legalActions is None:
+            key = "\n".join(self.layoutText)
+            if key not in LEGAL_ACTIONS_CACHE:
+                LEGAL_ACTIONS_CACHE[key] = self.computeLegalActions()
+            self.legalActions = LEGAL_ACTIONS_CACHE[key]
+        return self.legalActions
+
+    def computeLegalActions(self):
+        from game import Actions
+        actions = {}
+        for x, y in self.walls.asList(False):
+            possible = []
+            for dir, (dx, dy) in Actions._directionsAsList:
+                nextx, nexty = x + dx, y + dy
+                if 0 <= nextx < self.width and 0 <= nexty < self.height and not self.walls[nextx][nexty]:
+                    possible.append(dir)
+            actions[(x, y)] = tuple(possible)
+        actionSets = dict([(pos, frozenset(possible)) for pos, possible in actions.items()])
+        return actions, actionSets
+
     def isWall(self, pos):
         x, col = pos
         return self.walls[x][col]
@@ -90,7 +177,18 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        """
+        Copies the layout without parsing its text again.  Game states share
+        their layout instead (nothing changes a layout once it is built), so
+        this is only needed by code that wants to modify a private copy.
+        """
+        layout = copy.copy(self)
+        layout.layoutText = self.layoutText[:]
+        layout.walls = self.walls.copy()
+        layout.food = self.food.copy()
+        layout.capsules = self.capsules[:]
+        layout.agentPositions = self.agentPositions[:]
+        return layout
 
     def processLayoutText(self, layoutText):
         """
@@ -0,0 +1,164 @@
+# parallelTraining.py
+# -------------------
+
+"""
+Trains QLearningAgent with several worker processes sharing one Q-table.
+
+The table is copied into shared memory and every worker process plays its
+own busters games (BustersGameRules.newGame, as FastGames) against it,
+updating the shared values asynchronously without locks, in the same way a
+single agent updates its table between moves.  Workers cycle through the
+given layouts, so one run can train on all the laberynths/labAA*.lay mazes:
+
+  python parallelTraining.py -l laberynths/labAA1 -l laberynths/labAA2 -w 4 -n 500
+
+The parent process writes the shared table back to qtable.npy every
+--checkpoint seconds and once all workers are done.
+"""
+
+import multiprocessing, random, sys, time
+from Queue import Empty
+import numpy
+import busters, layout, qtable, textDisplay
+from bustersAgents import QLearningAgent
+
+def sharedQTable(table):
+    "Copies a QTable into shared memory that forked workers update in place"
+    rows, columns = table.values.shape
+    buffer = multiprocessing.RawArray('d', rows * columns)
+    values = numpy.frombuffer(buffer, dtype=numpy.float64).reshape(rows, columns)
+    values[:] = table.values
+    return qtable.QTable(values)
+
+def runWorker(workerIndex, table, layouts, ghostType, numGhosts, numEpisodes, seed, results):
+    """
+    Plays numEpisodes games, cycling through layouts, and reports the scores.
+    """
+    # Forked workers inherit the parent's random state; give each its own
+    random.seed(seed + workerIndex)
+    display = textDisplay.NullGraphics()
+    import __main__
+    __main__.__dict__['_display'] = display
+
+    rules = busters.BustersGameRules()
+    ghosts = [ghostType( i+1 ) for i in range( numGhosts )]
+    pacman = QLearningAgent(ghostAgents = ghosts, table = table)
+    scores = []
+    for episode in range( numEpisodes ):
+        board = layouts[episode % len(layouts)]
+        game = rules.newGame( board, pacman, ghosts[:board.getNumGhosts()], display, fast=True )
+        game.run()
+        scores.append(game.state.getScore())
+    results.put((workerIndex, scores))
+
+def trainParallel( layouts, ghostType, numGhosts, numWorkers, numEpisodes, tablePath, checkpoint=60, seed=0 ):
+    """
+    Runs numWorkers processes playing numEpisodes games each against the
+    table stored at tablePath, and returns the list of scores per worker.
+    """
+    table = qtable.loadQTable(tablePath, "qtable.txt")
+    shared = sharedQTable(table)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=runWorker,
+                                       args=(i, shared, layouts, ghostType, numGhosts, numEpisodes, seed, results))
+               for i in range( numWorkers )]
+
+    startTime = time.time()
+    for worker in workers: worker.start()
+
+    scores = [None for worker in workers]
+    lastSave = time.time()
+    while None in scores:
+        try:
+            workerIndex, workerScores = results.get(timeout=1)
+            scores[workerIndex] = workerScores
+            continue
+        except Empty:
+            pass
+        if time.time() - lastSave > checkpoint:
+            table.values[:] = shared.values
+            table.save()
+            lastSave = time.time()
+        lost = [i for i, worker in enumerate(workers) if scores[i] is None and not worker.is_alive()]
+        if lost:
+            # A worker that just finished may still have its scores in the pipe
+            try:
+                workerIndex, workerScores = results.get(timeout=1)
+                scores[workerIndex] = workerScores
+                continue
+            except Empty:
+                pass
+            for worker in workers:
+                if worker.is_alive(): worker.terminate()
+            for worker in workers: worker.join()
+            table.values[:] = shared.values
+            table.save()
+            raise Exception('Worker %d exited with code %s without reporting its scores' %
+                            (lost[0], workers[lost[0]].exitcode))
+    for worker in workers: worker.join()
+    elapsed = time.time() - startTime
+
+    table.values[:] = shared.values
+    table.save()
+
+    episodes = numWorkers * numEpisodes
+    allScores = [score for workerScores in scores for score in workerScores]
+    print 'Average Score:', sum(allScores) / float(len(allScores))
+    print 'Episodes/sec:  %.2f (%d in %.2fs, %d workers)' % (episodes / max(elapsed, 1e-9), episodes, elapsed, numWorkers)
+    return scores
+
+def readCommand( argv ):
+    """
+    Processes the command used to run parallel training from the command line.
+    """
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python parallelTraining.py <options>
+    EXAMPLE:    python parallelTraining.py -l laberynths/labAA1 -l laberynths/labAA2 -w 4 -n 500
+                  - trains qtable.npy with 4 processes, 500 games each
+    """
+    parser = OptionParser(usageStr)
+
+    parser.add_option('-l', '--layout', dest='layouts', action='append',
+                      help='a LAYOUT_FILE to train on; repeat to cycle through several',
+                      metavar='LAYOUT_FILE')
+    parser.add_option('-g', '--ghosts', dest='ghost',
+                      help=busters.default('the ghost agent TYPE in the ghostAgents module to use'),
+                      metavar = 'TYPE', default='RandomGhost')
+    parser.add_option('-k', '--numghosts', type='int', dest='numGhosts',
+                      help=busters.default('The maximum number of ghosts to use'), default=4)
+    parser.add_option('-w', '--workers', type='int', dest='numWorkers',
+                      help=busters.default('the number of worker processes'),
+                      default=multiprocessing.cpu_count())
+    parser.add_option('-n', '--numGames', dest='numEpisodes', type='int',
+                      help=busters.default('the number of GAMES each worker plays'), metavar='GAMES', default=100)
+    parser.add_option('-t', '--table', dest='tablePath',
+                      help=busters.default('the Q-table to train'), default='qtable.npy')
+    parser.add_option('-c', '--checkpoint', dest='checkpoint', type='float',
+                      help=busters.default('Seconds between Q-table saves while training'), default=60)
+    parser.add_option('-s', '--seed', dest='seed', type='int',
+                      help=busters.default('Random seed of the first worker'), default=0)
+
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    args = dict()
+
+    layouts = []
+    for name in options.layouts or ['laberynths/labAA1']:
+        board = layout.getLayout( name )
+        if board == None: raise Exception("The layout " + name + " cannot be found")
+        layouts.append(board)
+    args['layouts'] = layouts
+    args['ghostType'] = busters.loadAgent(options.ghost, True)
+    args['numGhosts'] = options.numGhosts
+    args['numWorkers'] = options.numWorkers
+    args['numEpisodes'] = options.numEpisodes
+    args['tablePath'] = options.tablePath
+    args['checkpoint'] = options.checkpoint
+    args['seed'] = options.seed
+    return args
+
+if __name__ == '__main__':
+    args = readCommand( sys.argv[1:] )
+    trainParallel( **args )
@@ -0,0 +1,123 @@
+# qtable.py
+# ---------
+
+"""
+Storage for the Q-table used by QLearningAgent.
+
+The table is a (states x actions) float64 NumPy array.  It is persisted as a
+.npy file, read into memory once and written back whole by save (at the
+agent's checkpoints and on exit), so no text is parsed or formatted while
+training and the file only ever holds a table as of a checkpoint.
+
+The old text format (one state per line, space separated floats, as in
+qtable.txt and qtable.ini.txt) is still supported through readText and
+writeText, and from the command line:
+
+  python qtable.py import qtable.txt qtable.npy
+  python qtable.py export qtable.npy qtable.txt
+"""
+
+import os, sys
+import numpy
+
+class QTable:
+    """
+    A table of Q-values indexed as table[state][action].
+
+    Rows are views into the underlying array, so table[state][action] = value
+    updates the table in place.  When the table was loaded from a file, save()
+    writes it back; tables without a path (e.g. shared between processes)
+    are never saved by the agent itself.
+    """
+
+    def __init__(self, values, path=None):
+        self.values = values
+        self.path = path
+
+    def __getitem__(self, state):
+        return self.values[state]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def maxValue(self, state, columns=None):
+        "Returns the highest Q-value of a state, optionally among some action columns"
+        row = self.values[state]
+        if columns is not None:
+            row = row[columns]
+        return float(row.max())
+
+    def argMax(self, state, columns=None):
+        """
+        Returns the action columns holding the highest Q-value of a state.
+
+        All tied columns are returned, in the order they appear in columns.
+        """
+        if columns is None:
+            columns = numpy.arange(self.values.shape[1])
+        columns = numpy.asarray(columns)
+        row = self.values[state][columns]
+        return list(columns[row == row.max()])
+
+    def save(self):
+        """
+        Writes the table back to its file, if it has one.  The table is
+        written to a temporary file first and renamed over the old one, so
+        a run killed while saving leaves the previous table intact.
+        """
+        if self.path is None:
+            return
+        temporary = self.path + '.tmp'
+        saveArray(temporary, self.values)
+        os.rename(temporary, self.path)
+
+    def exportText(self, path):
+        "Writes the table in the qtable.txt text format"
+        writeText(self.values, path)
+
+def loadQTable(path, textPath=None):
+    """
+    Reads the .npy table at path into memory.
+
+    If path does not exist yet it is created from the text table at textPath
+    (see readText), so the first run picks up an existing qtable.txt.
+    """
+    if not os.path.exists(path):
+        if textPath is None:
+            raise Exception('The Q-table ' + path + ' cannot be found')
+        saveArray(path, readText(textPath))
+    return QTable(numpy.load(path), path)
+
+def saveArray(path, values):
+    "Saves values as .npy at exactly path (numpy.save would append a suffix)"
+    f = open(path, 'wb')
+    try: numpy.save(f, values)
+    finally: f.close()
+
+def readText(path):
+    "Parses a text Q-table (one row of space separated floats per state)"
+    f = open(path)
+    try: return numpy.array([[float(x) for x in line.split()] for line in f], dtype=numpy.float64)
+    finally: f.close()
+
+def writeText(values, path):
+    "Writes a table in the same format QLearningAgent.writeQtable used to"
+    f = open(path, 'w')
+    try:
+        for row in values:
+            f.write(''.join([str(float(item)) + " " for item in row]))
+            f.write("\n")
+    finally: f.close()
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] not in ['import', 'export']:
+        print 'USAGE: python qtable.py import|export <source> <destination>'
+        sys.exit(2)
+    command, source, destination = sys.argv[1:]
+    if command == 'import':
+        saveArray(destination, readText(source))
+    else:
+        writeText(numpy.load(source, mmap_mode='r'), destination)
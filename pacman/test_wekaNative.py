@@ -0,0 +1,133 @@
+# test_wekaNative.py
+# ------------------
+
+"""
+Round-trips Weka's Explorer output for models trained on the weather
+dataset through wekaNative.  Run with:
+
+  python -m unittest test_wekaNative
+"""
+
+import json, os, tempfile, unittest
+import wekaNative
+
+WEATHER_ARFF = """@relation weather
+
+@attribute outlook {sunny, overcast, rainy}
+@attribute temperature numeric
+@attribute humidity numeric
+@attribute windy {TRUE, FALSE}
+@attribute play {yes, no}
+
+@data
+sunny,85,85,FALSE,no
+"""
+
+WEATHER = [['sunny', 85, 85, 'FALSE', 'no'], ['sunny', 80, 90, 'TRUE', 'no'],
+           ['overcast', 83, 86, 'FALSE', 'yes'], ['rainy', 70, 96, 'FALSE', 'yes'],
+           ['rainy', 68, 80, 'FALSE', 'yes'], ['rainy', 65, 70, 'TRUE', 'no'],
+           ['overcast', 64, 65, 'TRUE', 'yes'], ['sunny', 72, 95, 'FALSE', 'no'],
+           ['sunny', 69, 70, 'FALSE', 'yes'], ['rainy', 75, 80, 'FALSE', 'yes'],
+           ['sunny', 75, 70, 'TRUE', 'yes'], ['overcast', 72, 90, 'TRUE', 'yes'],
+           ['overcast', 81, 75, 'FALSE', 'yes'], ['rainy', 71, 91, 'TRUE', 'no']]
+
+SUMMARY = """
+Time taken to build model: 0 seconds
+
+=== Stratified cross-validation ===
+=== Summary ===
+
+Correctly Classified Instances           9               64.2857 %
+Incorrectly Classified Instances         5               35.7143 %
+"""
+
+J48_OUTPUT = """=== Classifier model (full training set) ===
+
+J48 pruned tree
+------------------
+
+outlook = sunny
+|   humidity <= 75: yes (2.0)
+|   humidity > 75: no (3.0)
+outlook = overcast: yes (4.0)
+outlook = rainy
+|   windy = TRUE: no (2.0)
+|   windy = FALSE: yes (3.0)
+
+Number of Leaves  : \t5
+
+Size of the tree : \t8
+
+""" + SUMMARY
+
+NAIVE_BAYES_OUTPUT = """=== Classifier model (full training set) ===
+
+Naive Bayes Classifier
+
+                 Class
+Attribute          yes      no
+                 (0.63)  (0.38)
+================================
+outlook
+  sunny             3.0     4.0
+  overcast          5.0     1.0
+  rainy             4.0     3.0
+  [total]          12.0     8.0
+
+temperature
+  mean          72.9697 74.8364
+  std. dev.      5.2304   7.384
+  weight sum          9       5
+  precision      1.9091  1.9091
+
+humidity
+  mean          78.8395 86.1111
+  std. dev.      9.8023  9.2424
+  weight sum          9       5
+  precision      3.4444  3.4444
+
+windy
+  TRUE              4.0     4.0
+  FALSE             7.0     3.0
+  [total]          11.0     7.0
+
+""" + SUMMARY
+
+class WekaNativeTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.arffName = tempfile.mkstemp(suffix='.arff')
+        os.write(handle, WEATHER_ARFF)
+        os.close(handle)
+        self.attributes = wekaNative.readArffHeader(self.arffName)
+
+    def tearDown(self):
+        os.remove(self.arffName)
+
+    def roundTrip(self, text):
+        "Parses text and loads the model back from its JSON, as exportModel and loadModel do"
+        model = wekaNative.parseModel(text, self.attributes)
+        return wekaNative.NativeModel(json.loads(json.dumps(model)))
+
+    def testReadArffHeader(self):
+        self.assertEqual([a['name'] for a in self.attributes], ['outlook', 'temperature', 'humidity', 'windy', 'play'])
+        self.assertEqual(self.attributes[0]['values'], ['sunny', 'overcast', 'rainy'])
+        self.assertEqual(self.attributes[1]['values'], None)
+
+    def testJ48(self):
+        model = self.roundTrip(J48_OUTPUT)
+        self.assertEqual(model.type, 'J48')
+        instances = [[str(v) for v in row[:-1]] for row in WEATHER]
+        self.assertEqual(model.predictBatch(instances), [row[-1] for row in WEATHER])
+
+    def testNaiveBayes(self):
+        model = self.roundTrip(NAIVE_BAYES_OUTPUT)
+        self.assertEqual(model.type, 'NaiveBayes')
+        self.assertEqual(model.model['labels'], ['yes', 'no'])
+        self.assertEqual(sorted(model.model['estimators'].keys()), ['0', '1', '2', '3'])
+        self.assertAlmostEqual(model.model['priors'][0], 10 / 16.0)
+        self.assertEqual(model.predictBatch([['overcast', '70', '70', 'FALSE'], ['sunny', '85', '95', 'TRUE']]),
+                         ['yes', 'no'])
+
+if __name__ == '__main__':
+    unittest.main()
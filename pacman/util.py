@@ -14,7 +14,7 @@
 
 import sys
 import inspect
-import heapq, random
+import bisect, heapq, operator, random
 import cStringIO
 
 
@@ -327,7 +327,7 @@ class Counter(dict):
         """
         Returns a copy of the counter
         """
-        return Counter(dict.copy(self))
+        return self.__class__(dict.copy(self))
 
     def __mul__(self, y ):
         """
@@ -387,7 +387,7 @@ class Counter(dict):
         >>> (a + b)['first']
         1
         """
-        addend = Counter()
+        addend = self.__class__()
         for key in self:
             if key in y:
                 addend[key] = self[key] + y[key]
@@ -413,7 +413,7 @@ class Counter(dict):
         >>> (a - b)['first']
         -5
         """
-        addend = Counter()
+        addend = self.__class__()
         for key in self:
             if key in y:
                 addend[key] = self[key] - y[key]
@@ -425,6 +425,57 @@ class Counter(dict):
             addend[key] = -1 * y[key]
         return addend
 
+class LeanCounter(Counter):
+    """
+    A Counter whose reads never insert keys.
+
+    Missing keys still read as 0, so a['blah'] += 1 works as with Counter,
+    but looking up a key that is not there leaves the counter unchanged, and
+    argMax, sortedKeys, totalCount and normalize each make a single pass over
+    the items.  Used for the distributions built on every move (ghost
+    actions, observations and beliefs).
+
+    >>> a = LeanCounter()
+    >>> a['test']
+    0
+    >>> len(a)
+    0
+    """
+    __getitem__ = dict.__getitem__
+
+    def __missing__(self, key):
+        return 0
+
+    def argMax(self):
+        """
+        Returns the key with the highest value (the first one seen on ties).
+        """
+        if len(self) == 0: return None
+        return max(self.iteritems(), key=operator.itemgetter(1))[0]
+
+    def sortedKeys(self):
+        """
+        Returns a list of keys sorted by their values.  Keys
+        with the highest values will appear first.
+        """
+        return [key for key, value in sorted(self.iteritems(), key=operator.itemgetter(1), reverse=True)]
+
+    def totalCount(self):
+        """
+        Returns the sum of counts for all keys.
+        """
+        return sum(self.itervalues())
+
+    def normalize(self):
+        """
+        Edits the counter such that the total count of all
+        keys sums to 1.
+        """
+        total = float(sum(self.itervalues()))
+        if total == 0: return
+        for key, value in self.items():
+            dict.__setitem__(self, key, value / total)
+
 def raiseNotDefined():
     fileName = inspect.stack()[1][1]
     line = inspect.stack()[1][2]
@@ -437,9 +488,9 @@ def normalize(vectorOrCounter):
     """
     normalize a vector or counter by dividing each value by the sum of all values
     """
-    normalizedCounter = Counter()
-    if type(vectorOrCounter) == type(normalizedCounter):
+    if isinstance(vectorOrCounter, Counter):
         counter = vectorOrCounter
+        normalizedCounter = counter.__class__()
         total = float(counter.totalCount())
         if total == 0: return counter
         for key in counter.keys():
@@ -452,35 +503,59 @@ def normalize(vectorOrCounter):
         if s == 0: return vector
         return [el / s for el in vector]
 
+class Sampler:
+    """
+    A discrete distribution prepared for repeated sampling.
+
+    It takes the same arguments as sample: a Counter, or a list of
+    probabilities and the list of values they belong to.  The cumulative
+    probabilities are computed once, so each draw is a single random.random()
+    and a binary search, and returns exactly what sample would have returned
+    for that random number.
+    """
+    def __init__(self, distribution, values = None):
+        if isinstance(distribution, Counter):
+            items = sorted(distribution.items())
+            distribution = [i[1] for i in items]
+            values = [i[0] for i in items]
+        if sum(distribution) != 1:
+            distribution = normalize(distribution)
+        self.values = values
+        self.cumulative = []
+        total = 0.0
+        for prob in distribution:
+            total += prob
+            self.cumulative.append(total)
+
+    def sample(self):
+        return self.values[self.index(random.random())]
+
+    def sampleMany(self, n):
+        "Returns n independent samples"
+        return [self.sample() for i in range(n)]
+
+    def index(self, choice):
+        "The index of the first value whose cumulative probability reaches choice"
+        return min(bisect.bisect_left(self.cumulative, choice), len(self.cumulative) - 1)
+
+def sampleMany(distribution, n, values = None):
+    "Draws n independent samples of a distribution given as for sample"
+    return Sampler(distribution, values).sampleMany(n)
+
 def nSample(distribution, values, n):
     if sum(distribution) != 1:
         distribution = normalize(distribution)
     rand = [random.random() for i in range(n)]
     rand.sort()
-    samples = []
-    samplePos, distPos, cdf = 0,0, distribution[0]
-    while samplePos < n:
-        if rand[samplePos] < cdf:
-            samplePos += 1
-            samples.append(values[distPos])
-        else:
-            distPos += 1
-            cdf += distribution[distPos]
-    return samples
+    cumulative = []
+    cdf = 0
+    for prob in distribution:
+        cdf += prob
+        cumulative.append(cdf)
+    return [values[bisect.bisect_right(cumulative, r)] for r in rand]
 
 def sample(distribution, values = None):
-    if type(distribution) == Counter:
-        items = sorted(distribution.items())
-        distribution = [i[1] for i in items]
-        values = [i[0] for i in items]
-    if sum(distribution) != 1:
-        distribution = normalize(distribution)
-    choice = random.random()
-    i, total= 0, distribution[0]
-    while choice > total:
-        i += 1
-        total += distribution[i]
-    return values[i]
+    return Sampler(distribution, values).sample()
 
 def sampleFromCounter(ctr):
     items = sorted(ctr.items())
@@ -502,14 +577,20 @@ def flipCoin( p ):
     return r < p
 
 def chooseFromDistribution( distribution ):
-    "Takes either a counter or a list of (prob, key) pairs and samples"
-    if type(distribution) == dict or type(distribution) == Counter:
+    "Takes either a counter, a Sampler or a list of (prob, key) pairs and samples"
+    if isinstance(distribution, Sampler):
+        return distribution.sample()
+    if isinstance(distribution, dict):
         return sample(distribution)
     r = random.random()
+    cumulative, elements = [], []
     base = 0.0
     for prob, element in distribution:
         base += prob
-        if r <= base: return element
+        cumulative.append(base)
+        elements.append(element)
+    i = bisect.bisect_left(cumulative, r)
+    if i < len(elements): return elements[i]
 
 def nearestPoint( pos ):
     """
@@ -0,0 +1,186 @@
+# vectorBusters.py
+# ----------------
+
+"""
+Steps many independent busters games at once with NumPy.
+
+VectorBustersEnv keeps N games on one layout as arrays of cell indices
+(Pacman, ghosts), a living mask, a food board and the scores, and applies
+one Pacman action per game plus a random move of every ghost per step:
+
+  env = VectorBustersEnv(layout.getLayout('laberynths/labAA1'), 1000)
+  env.reset()
+  while not env.done.all():
+      rewards, done = env.step(env.randomActions())
+
+The rules are those of busters.PacmanRules and busters.GhostRules with
+RandomGhost ghosts: the time penalty, collisions within
+COLLISION_TOLERANCE, jail placement, FOOD_SCORE and GHOST_SCORE, winning
+when every ghost is caught and losing after maxMoves rounds.  Ghost moves
+come from a NumPy generator, so games do not replay those played with
+busters.py under the same seed.
+"""
+
+import numpy
+import busters
+from game import Actions, Directions
+
+# Action indices used by step
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+ACTION_INDEX = dict([(action, i) for i, action in enumerate(ACTIONS)])
+
+class VectorBustersEnv:
+    """
+    N busters games on the same layout, advanced together by step.
+
+    State, one row per game:
+      pacman  -- Pacman's cell index (into self.cells)
+      ghosts  -- (N x numGhosts) ghost cell indices
+      living  -- (N x numGhosts) mask of the ghosts not yet caught
+      food    -- (N x numCells) mask of the cells holding food
+      score   -- the game score
+      moveCount -- the number of rounds played
+      done    -- whether the game has ended (won or lost)
+    """
+
+    def __init__( self, layout, numGames, numGhosts=None, maxMoves=-1, seed=None ):
+        self.layout = layout
+        self.numGames = numGames
+        self.maxMoves = maxMoves
+        self.random = numpy.random.RandomState(seed)
+
+        positions = [pos for isPacman, pos in layout.agentPositions]
+        if numGhosts is None: numGhosts = layout.getNumGhosts()
+        self.numGhosts = min(numGhosts, len(positions) - 1)
+
+        # Jails are isolated open cells in the busters mazes, but are
+        # indexed even where a layout walls them in
+        jails = [busters.GhostRules.getJailPosition(i + 1) for i in range(self.numGhosts)]
+        legalActions = layout.getLegalActions()
+        self.cells = layout.walls.asList(False) + [pos for pos in jails if pos not in legalActions]
+        self.cellIndex = dict([(pos, i) for i, pos in enumerate(self.cells)])
+        numCells = len(self.cells)
+        self.cellX = numpy.array([x for x, y in self.cells])
+        self.cellY = numpy.array([y for x, y in self.cells])
+
+        # successors[cell, action] is the cell reached, or -1 if illegal;
+        # moves[cell, :numMoves[cell]] are the legal successors, for ghosts
+        self.successors = -numpy.ones((numCells, len(ACTIONS)), dtype=numpy.int32)
+        self.moves = numpy.zeros((numCells, len(ACTIONS)), dtype=numpy.int32)
+        self.numMoves = numpy.zeros(numCells, dtype=numpy.int32)
+        for cell, pos in enumerate(self.cells):
+            possible = legalActions.get(pos, (Directions.STOP,))
+            for k, action in enumerate(possible):
+                target = self.cellIndex[Actions.getSuccessor(pos, action)]
+                self.successors[cell, ACTION_INDEX[action]] = target
+                self.moves[cell, k] = target
+            self.numMoves[cell] = len(possible)
+
+        self.startPacman = self.cellIndex[positions[0]]
+        self.startGhosts = numpy.array([self.cellIndex[pos] for pos in positions[1:self.numGhosts + 1]], dtype=numpy.int32)
+        self.jails = numpy.array([self.cellIndex[pos] for pos in jails], dtype=numpy.int32)
+        self.startFood = numpy.zeros(numCells, dtype=bool)
+        for pos in layout.food.asList():
+            self.startFood[self.cellIndex[pos]] = True
+
+        self.pacman = numpy.zeros(numGames, dtype=numpy.int32)
+        self.ghosts = numpy.zeros((numGames, self.numGhosts), dtype=numpy.int32)
+        self.living = numpy.zeros((numGames, self.numGhosts), dtype=bool)
+        self.food = numpy.zeros((numGames, numCells), dtype=bool)
+        self.score = numpy.zeros(numGames, dtype=numpy.int64)
+        self.moveCount = numpy.zeros(numGames, dtype=numpy.int64)
+        self.done = numpy.ones(numGames, dtype=bool)
+
+    def reset( self, games=None ):
+        """
+        Starts new games, in every slot or in those selected by games (an
+        index array or boolean mask).
+        """
+        if games is None: games = slice(None)
+        self.pacman[games] = self.startPacman
+        self.ghosts[games] = self.startGhosts
+        self.living[games] = True
+        self.food[games] = self.startFood
+        self.score[games] = 0
+        self.moveCount[games] = 0
+        self.done[games] = False
+
+    def getLegalActions( self ):
+        "(N x len(ACTIONS)) mask of Pacman's legal actions in every game"
+        return self.successors[self.pacman] >= 0
+
+    def randomActions( self ):
+        "A uniformly random legal Pacman action index for every game"
+        choices = self.randomChoices(self.pacman)
+        # Translate the k-th legal move back into its action index
+        legal = self.successors[self.pacman] >= 0
+        order = numpy.cumsum(legal, axis=1) - 1
+        return numpy.argmax(legal & (order == choices[:, None]), axis=1)
+
+    def randomChoices( self, cells ):
+        "For every cell, the position of a uniformly random legal move among moves[cell]"
+        return (self.random.random_sample(len(cells)) * self.numMoves[cells]).astype(numpy.int32)
+
+    def step( self, actions ):
+        """
+        Plays one round in every unfinished game: Pacman takes actions[i]
+        (an index into ACTIONS) in game i, then each ghost makes a random
+        legal move, stopping as soon as the last ghost is caught.
+
+        Returns the score change of every game and the done mask.  Finished
+        games are left as they are until reset.
+        """
+        actions = numpy.asarray(actions)
+        active = ~self.done
+        before = self.score.copy()
+
+        # Pacman moves (PacmanRules.applyAction) and time passes
+        targets = self.successors[self.pacman, actions]
+        if (targets[active] < 0).any():
+            raise Exception("Illegal action in games " + str(numpy.flatnonzero(active & (targets < 0))))
+        self.pacman[active] = targets[active]
+        self.score[active] -= busters.TIME_PENALTY
+
+        # Anyone can be caught (GhostRules.checkDeath), then food is eaten
+        for i in range(self.numGhosts):
+            self.checkDeath(active, i)
+        eaten = active & self.food[numpy.arange(self.numGames), self.pacman]
+        self.food[eaten, self.pacman[eaten]] = False
+        self.score[eaten] += busters.FOOD_SCORE
+        self.finish(active)
+
+        # Ghosts move in turn while their game goes on
+        for i in range(self.numGhosts):
+            active &= ~self.done
+            games = numpy.flatnonzero(active)
+            cells = self.ghosts[games, i]
+            self.ghosts[games, i] = self.moves[cells, self.randomChoices(cells)]
+            self.checkDeath(active, i)
+            self.finish(active)
+
+        active &= ~self.done
+        self.moveCount[active] += 1
+        if self.maxMoves > 0:
+            self.done |= active & (self.moveCount >= self.maxMoves)
+        return self.score - before, self.done
+
+    def checkDeath( self, active, i ):
+        "Sends ghost i to jail in the active games where it meets Pacman"
+        ghosts = self.ghosts[:, i]
+        distance = (numpy.abs(self.cellX[ghosts] - self.cellX[self.pacman]) +
+                    numpy.abs(self.cellY[ghosts] - self.cellY[self.pacman]))
+        caught = active & (distance <= busters.COLLISION_TOLERANCE)
+        self.score[caught] += busters.GHOST_SCORE
+        self.ghosts[caught, i] = self.jails[i]
+        self.living[caught, i] = False
+
+    def finish( self, active ):
+        "Ends the active games where every ghost has been caught"
+        self.done |= active & ~self.living.any(axis=1)
+
+    def isWin( self ):
+        return ~self.living.any(axis=1)
+
+    def getPositions( self, cells ):
+        "The (x, y) positions of an array of cell indices, as two arrays"
+        return self.cellX[cells], self.cellY[cells]
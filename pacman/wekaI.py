@@ -9,66 +9,114 @@ from weka.classifiers import Classifier
 # pip install javabridge
 # pip install python-weka-wrapper==0.3.0
 
-class Weka:
+class WekaSession:
+	"""
+	Un modelo de Weka cargado una sola vez para hacer muchas predicciones.
 
-	# Arranca la maquina virtual de java
-	#
-	def start_jvm(self):
-		jvm.start()
+	El arff (solo su estructura) y el modelo se leen al crear la sesion, y
+	para cada atributo nominal se guarda un diccionario de sus valores a su
+	posicion, de modo que predict no vuelve a tocar el disco.
+	"""
 
-	# Para la maquina virtual de java
-	def stop_jvm(self):
-		jvm.stop()
-
-	# Predice el valor de la instancia pasada como parametro
 	# @param modelName: Nombre del fichero que contiene el modelo generado en weka
-	# @param x: La instancia que se pretende clasificar
 	# @param arffName: El nombre del fichero arff que se ha utilizado para generar el modelo en Weka
-	# @return pred: La clase que predice
 	#
-	def predict(self, modelName, x, arffName, debug=False):
+	def __init__(self, modelName, arffName, debug=False):
+		self.debug = debug
+
 		# Carga el arrf para conocer la estructura de las instancias
 		loader = Loader(classname="weka.core.converters.ArffLoader")
-		data = loader.load_file(arffName)
-
+		self.data = loader.load_file(arffName)
 
 		# Se asume que la clase es el ultimo atributo
-		data.class_is_last()
+		self.data.class_is_last()
 
 		# Carga del modelo generado en Weka
 		objects = serialization.read_all(modelName)
-		cls = Classifier(jobject=objects[0])
+		self.cls = Classifier(jobject=objects[0])
 		if(debug):
 			print("Loaded model...")
-			print(cls)
-
-		# Se crea la instancia correspondiente a la entrada y se clasifica
-		if(debug): print("Input", x)
+			print(self.cls)
 
-		# Anyade un valor tonto para la clase de la instancia
-		if data.class_attribute.is_nominal:
-			x.append('a')
-		else:
-			x.append(0)
-
-		# Convierte los valores nominales a la posicion entera que ocupa dentro de sus lista
-		#print data.num_attributes
-		for i in range(0, data.num_attributes):
-			attribute = data.attribute(i)
+		# Posicion de cada valor de los atributos nominales (None si es numerico)
+		self.indexMaps = []
+		for i in range(0, self.data.num_attributes):
+			attribute = self.data.attribute(i)
 			if attribute.is_nominal:
-				x[i] = attribute.index_of(x[i])
-			'''print x[i]
-		print '''''
-		# Realiza la prediccion
-		inst = Instance.create_instance(x)
-		inst.dataset = data
-		pred = cls.classify_instance(inst)
-		if data.class_attribute.is_nominal:
-			pred =  data.class_attribute.value(pred)
-		if(debug): print("Prediction", pred)
+				self.indexMaps.append(dict([(attribute.value(j), j) for j in range(attribute.num_values)]))
+			else:
+				self.indexMaps.append(None)
+		self.classIsNominal = self.data.class_attribute.is_nominal
+		if self.classIsNominal:
+			self.classValues = [self.data.class_attribute.value(j) for j in range(self.data.class_attribute.num_values)]
+
+	# Convierte una instancia en la lista de valores que espera Weka
+	# @param x: La instancia, sin la clase
+	# @return values: Los valores, con los nominales como la posicion entera que ocupan en su lista
+	#
+	def encode(self, x):
+		# Anyade un valor tonto para la clase de la instancia
+		values = list(x) + [0]
+		for i, indexMap in enumerate(self.indexMaps):
+			if indexMap is not None:
+				values[i] = indexMap.get(values[i], -1)
+		return values
 
+	# Predice el valor de la instancia pasada como parametro
+	# @param x: La instancia que se pretende clasificar
+	# @return pred: La clase que predice
+	#
+	def predict(self, x):
+		if(self.debug): print("Input", x)
+		inst = Instance.create_instance(self.encode(x))
+		inst.dataset = self.data
+		pred = self.cls.classify_instance(inst)
+		if self.classIsNominal:
+			pred = self.classValues[int(pred)]
+		if(self.debug): print("Prediction", pred)
 		return pred
 
+	# Predice el valor de una lista de instancias
+	# @param xs: Las instancias que se pretende clasificar
+	# @return preds: La clase que predice para cada una
+	#
+	def predictBatch(self, xs):
+		return [self.predict(x) for x in xs]
+
+class Weka:
+
+	def __init__(self):
+		# Sesiones ya cargadas, por (modelName, arffName)
+		self.sessions = {}
+
+	# Arranca la maquina virtual de java
+	#
+	def start_jvm(self):
+		jvm.start()
+
+	# Para la maquina virtual de java
+	def stop_jvm(self):
+		jvm.stop()
+
+	# Devuelve la sesion del modelo, cargandola la primera vez que se pide
+	# @param modelName: Nombre del fichero que contiene el modelo generado en weka
+	# @param arffName: El nombre del fichero arff que se ha utilizado para generar el modelo en Weka
+	#
+	def session(self, modelName, arffName, debug=False):
+		key = (modelName, arffName)
+		if key not in self.sessions:
+			self.sessions[key] = WekaSession(modelName, arffName, debug)
+		return self.sessions[key]
+
+	# Predice el valor de la instancia pasada como parametro
+	# @param modelName: Nombre del fichero que contiene el modelo generado en weka
+	# @param x: La instancia que se pretende clasificar
+	# @param arffName: El nombre del fichero arff que se ha utilizado para generar el modelo en Weka
+	# @return pred: La clase que predice
+	#
+	def predict(self, modelName, x, arffName, debug=False):
+		return self.session(modelName, arffName, debug).predict(x)
+
 ################################# DEBUG ##############################################
 #weka = Weka()
 #weka.start_jvm()
@@ -0,0 +1,347 @@
+# wekaNative.py
+# -------------
+
+"""
+Weka models evaluated in plain Python, without starting a JVM.
+
+A trained model is exported once from the text Weka prints for it (the
+"Classifier model" section of the Explorer output, or str() of a
+python-weka-wrapper Classifier) and the header of its training ARFF, into
+a small JSON file:
+
+  python wekaNative.py ../p1/models/j48.model training.arff j48.json
+  python wekaNative.py j48-output.txt training.arff j48.json
+
+Reading a .model file needs the JVM (through wekaI); a saved text output
+does not.  loadModel then gives a NativeModel with the same predict and
+predictBatch as wekaI.WekaSession.
+
+Supported models are J48 trees, NaiveBayes with normal estimators,
+LinearRegression and Logistic.  Since the text holds the numbers rounded
+as Weka prints them (4 decimals for most models), predictions near a
+decision boundary may differ from Weka's.
+"""
+
+import json, math, re, sys
+
+def readArffHeader(arffName):
+    """
+    Returns the attributes declared by an ARFF file as a list of
+    {'name': name, 'values': [nominal values] or None} dicts.
+    """
+    attributes = []
+    f = open(arffName)
+    try:
+        for line in f:
+            line = line.strip()
+            if line.lower().startswith('@data'):
+                break
+            if not line.lower().startswith('@attribute'):
+                continue
+            match = re.match(r"@attribute\s+('[^']*'|\S+)\s+(.*)$", line, re.IGNORECASE)
+            name, kind = unquote(match.group(1)), match.group(2).strip()
+            if kind.startswith('{'):
+                values = [unquote(value.strip()) for value in kind.strip('{}').split(',')]
+            else:
+                values = None
+            attributes.append({'name': name, 'values': values})
+    finally: f.close()
+    return attributes
+
+def unquote(text):
+    if len(text) > 1 and text[0] == text[-1] and text[0] in '\'"':
+        return text[1:-1]
+    return text
+
+def parseModel(text, attributes):
+    """
+    Parses the text output of a Weka model trained on attributes (the last
+    one being the class) into the dict saved by exportModel.
+    """
+    for header, kind, parse in PARSERS:
+        if header in text:
+            model = {'type': kind, 'attributes': attributes}
+            model.update(parse(text.splitlines(), attributes))
+            return model
+    raise Exception('Unsupported Weka model:\n' + text[:200])
+
+def parseJ48(lines, attributes):
+    """
+    J48 trees are nested {'attribute': index, 'branches': [[operator,
+    value, subtree], ...]} nodes whose leaves are {'label': class,
+    'weight': training instances}.
+    """
+    index = attributeIndex(attributes)
+    start = [i for i, line in enumerate(lines) if line.startswith('J48')][0] + 2
+    root = {'branches': []}
+    stack = [root]
+    for line in lines[start:]:
+        if line.startswith('Number of Leaves'):
+            break
+        if not line.strip():
+            continue
+        leaf = re.match(r'^(.*): (.*) \(([\d.]+)(?:/[\d.]+)?\)$', line)
+        test = leaf.group(1) if leaf else line
+        if not test.strip():
+            # A tree with a single leaf
+            return {'tree': {'label': leaf.group(2), 'weight': float(leaf.group(3))}}
+        depth = len(re.match(r'^((?:\|   )*)', test).group(1)) / 4
+        name, operator, value = re.match(r'^(?:\|   )*(.+?) (<=|>|!=|=) (.*)$', test).groups()
+        parent = stack[depth]
+        parent['attribute'] = index[name]
+        if attributes[index[name]]['values'] is None:
+            value = float(value)
+        if leaf:
+            child = {'label': leaf.group(2), 'weight': float(leaf.group(3))}
+        else:
+            child = {'branches': []}
+            del stack[depth + 1:]
+            stack.append(child)
+        parent['branches'].append([operator, value, child])
+    return {'tree': root}
+
+def parseNaiveBayes(lines, attributes):
+    """
+    NaiveBayes keeps the class priors and, per attribute, either the
+    Laplace-corrected value counts of each class or the mean, standard
+    deviation and precision of the normal estimator of each class.
+    """
+    index = attributeIndex(attributes)
+    start = [i for i, line in enumerate(lines) if line.startswith('Attribute')][0]
+    labels = lines[start].split()[1:]
+    numClasses = len(labels)
+    printedPriors = [float(p.strip('()')) for p in lines[start + 1].split()]
+
+    estimators = {}
+    name = None
+    for line in lines[start + 3:]:
+        if not line.strip():
+            name = None
+            continue
+        if name is None:
+            # The model ends at the first line that names no attribute, such
+            # as the "Time taken to build model" of the Explorer's output
+            if line[0].isspace() or line.strip() not in index:
+                break
+            name = line.strip()
+            estimators[index[name]] = {}
+            continue
+        fields = line.split()
+        row = ' '.join(fields[:-numClasses])
+        estimators[index[name]][row] = [float(v) for v in fields[-numClasses:]]
+
+    model = {'labels': labels, 'estimators': {}}
+    weightSums = None
+    for i, rows in estimators.items():
+        if attributes[i]['values'] is None:
+            if 'mean' not in rows:
+                raise Exception('Only normal estimators are supported for ' + attributes[i]['name'])
+            model['estimators'][str(i)] = {'mean': rows['mean'], 'stdDev': rows['std. dev.'],
+                                           'precision': rows['precision']}
+            if weightSums is None: weightSums = rows['weight sum']
+        else:
+            totals = rows.pop('[total]')
+            model['estimators'][str(i)] = dict([(value, [count / total for count, total in zip(counts, totals)])
+                                                for value, counts in rows.items()])
+    if weightSums is not None:
+        # The printed priors are rounded to 2 decimals; rebuild them as the
+        # Laplace estimate Weka uses from the class weights
+        total = sum(weightSums) + numClasses
+        model['priors'] = [(w + 1) / total for w in weightSums]
+    else:
+        model['priors'] = printedPriors
+    return model
+
+def parseLinearRegression(lines, attributes):
+    """
+    LinearRegression is a list of [coefficient, term] pairs plus the
+    intercept; see termValue for the terms.
+    """
+    start = [i for i, line in enumerate(lines) if line.strip().endswith(' =')][0] + 1
+    coefficients = []
+    intercept = 0.0
+    for line in lines[start:]:
+        if not line.strip():
+            if coefficients: break
+            continue
+        term = re.match(r'^\s*(\S+)\s+\* (.+?)(?: \+)?$', line)
+        if term:
+            coefficients.append([float(term.group(1)), parseTerm(term.group(2), attributes)])
+        else:
+            intercept = float(line.strip())
+            break
+    return {'coefficients': coefficients, 'intercept': intercept}
+
+def parseLogistic(lines, attributes):
+    """
+    Logistic keeps one [coefficient per class but the last, term] row per
+    variable and the intercepts; the last class scores 0.
+    """
+    start = [i for i, line in enumerate(lines) if line.startswith('Variable')][0]
+    labels = lines[start].split()[1:]
+    classValues = attributes[-1]['values']
+    labels.extend([value for value in classValues if value not in labels])
+    numColumns = len(labels) - 1
+
+    coefficients = []
+    intercepts = [0.0] * numColumns
+    for line in lines[start + 2:]:
+        if not line.strip():
+            break
+        fields = line.split()
+        name = ' '.join(fields[:-numColumns])
+        values = [float(v) for v in fields[-numColumns:]]
+        if name == 'Intercept':
+            intercepts = values
+        else:
+            coefficients.append([values, parseTerm(name, attributes)])
+    return {'labels': labels, 'coefficients': coefficients, 'intercepts': intercepts}
+
+def parseTerm(name, attributes):
+    """
+    A term of a linear model is [attribute index, None] for a numeric
+    attribute or the position of a binary nominal one, and [attribute
+    index, [values]] for the indicator of a nominal attribute taking one
+    of values (printed by Weka as name=value1,value2).
+    """
+    index = attributeIndex(attributes)
+    if name in index:
+        return [index[name], None]
+    name, values = name.split('=', 1)
+    return [index[name], values.split(',')]
+
+def attributeIndex(attributes):
+    return dict([(attribute['name'], i) for i, attribute in enumerate(attributes)])
+
+PARSERS = [('J48', 'J48', parseJ48),
+           ('Naive Bayes Classifier', 'NaiveBayes', parseNaiveBayes),
+           ('Linear Regression Model', 'LinearRegression', parseLinearRegression),
+           ('Logistic Regression', 'Logistic', parseLogistic)]
+
+class NativeModel:
+    """
+    An exported Weka model.  predict takes an instance as a list of values
+    in ARFF attribute order, without the class; numeric values may be
+    numbers or strings, as the agents write them.
+    """
+
+    def __init__( self, model ):
+        self.model = model
+        self.type = model['type']
+        self.attributes = model['attributes']
+        if self.type == 'J48':
+            setFallbackLabels(model['tree'])
+        if self.type == 'NaiveBayes':
+            self.estimators = [(int(i), estimator) for i, estimator in model['estimators'].items()]
+            self.logPriors = [math.log(p) for p in model['priors']]
+
+    def predict( self, x ):
+        return getattr(self, 'predict' + self.type)(x)
+
+    def predictBatch( self, xs ):
+        return [self.predict(x) for x in xs]
+
+    def predictJ48( self, x ):
+        node = self.model['tree']
+        while 'branches' in node:
+            value = x[node['attribute']]
+            numeric = self.attributes[node['attribute']]['values'] is None
+            if numeric: value = float(value)
+            for operator, test, child in node['branches']:
+                if ((operator == '<=' and value <= test) or (operator == '>' and value > test) or
+                    (operator == '=' and value == test) or (operator == '!=' and value != test)):
+                    node = child
+                    break
+            else:
+                # A value the tree never saw: the majority class below
+                return node['fallback']
+        return node['label']
+
+    def predictNaiveBayes( self, x ):
+        scores = self.logPriors[:]
+        for i, estimator in self.estimators:
+            if 'mean' in estimator:
+                value = float(x[i])
+                for c in range(len(scores)):
+                    scores[c] += math.log(max(normalProbability(value, estimator['mean'][c],
+                                                                estimator['stdDev'][c], estimator['precision'][c]), 1e-300))
+            elif x[i] in estimator:
+                probabilities = estimator[x[i]]
+                for c in range(len(scores)):
+                    scores[c] += math.log(probabilities[c])
+        return self.model['labels'][scores.index(max(scores))]
+
+    def predictLinearRegression( self, x ):
+        return self.model['intercept'] + sum([coefficient * self.termValue(term, x)
+                                              for coefficient, term in self.model['coefficients']])
+
+    def predictLogistic( self, x ):
+        scores = self.model['intercepts'][:]
+        for coefficients, term in self.model['coefficients']:
+            value = self.termValue(term, x)
+            for c in range(len(scores)):
+                scores[c] += coefficients[c] * value
+        scores.append(0.0)
+        return self.model['labels'][scores.index(max(scores))]
+
+    def termValue( self, term, x ):
+        i, values = term
+        if values is not None:
+            return float(x[i] in values)
+        nominal = self.attributes[i]['values']
+        if nominal is not None:
+            return float(nominal.index(x[i]))
+        return float(x[i])
+
+def normalProbability(value, mean, stdDev, precision):
+    "The probability Weka's NormalEstimator gives to value"
+    if precision > 0:
+        value = round(value / precision) * precision
+    lower = (value - mean - precision / 2) / stdDev
+    upper = (value - mean + precision / 2) / stdDev
+    return 0.5 * (math.erf(upper / math.sqrt(2)) - math.erf(lower / math.sqrt(2)))
+
+def setFallbackLabels(node):
+    "Stores in every inner node its majority leaf class; returns the class weights below node"
+    if 'label' in node:
+        return {node['label']: node['weight']}
+    weights = {}
+    for operator, value, child in node['branches']:
+        for label, weight in setFallbackLabels(child).items():
+            weights[label] = weights.get(label, 0) + weight
+    node['fallback'] = max(weights.keys(), key=lambda label: weights[label])
+    return weights
+
+def exportModel(modelName, arffName, outName):
+    """
+    Exports the model in modelName (a serialized .model, which needs the
+    JVM, or Weka's text output for it) trained on arffName to outName.
+    """
+    attributes = readArffHeader(arffName)
+    if modelName.endswith('.model'):
+        from wekaI import Weka
+        weka = Weka()
+        weka.start_jvm()
+        try: text = str(weka.session(modelName, arffName).cls)
+        finally: weka.stop_jvm()
+    else:
+        f = open(modelName)
+        try: text = f.read()
+        finally: f.close()
+    model = parseModel(text, attributes)
+    f = open(outName, 'w')
+    try: json.dump(model, f)
+    finally: f.close()
+    return model
+
+def loadModel(path):
+    "Loads a model saved by exportModel"
+    f = open(path)
+    try: return NativeModel(json.load(f))
+    finally: f.close()
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4:
+        print 'USAGE: python wekaNative.py <model.model|weka-output.txt> <training.arff> <model.json>'
+        sys.exit(2)
+    exportModel(*sys.argv[1:])